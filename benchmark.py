@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the Reddit Lead Finder pipeline.
+Replays recorded or synthetic submissions through a fake Reddit backend so
+search and scoring performance can be measured without live credentials.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from functools import wraps
+from types import SimpleNamespace
+
+from main import RedditLeadFinder
+
+FILLER = ("the a my for with on this market today week price stock trade "
+          "position entry exit risk account broker money volume trend").split()
+
+
+class FakeSubmission:
+    """Submission object built from a payload in SubmissionCache format."""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.id = payload['id']
+        self.fullname = payload['fullname']
+        self.name = payload['fullname']
+        self.title = payload['title']
+        self.selftext = payload['selftext']
+        self.score = payload['score']
+        self.num_comments = payload['num_comments']
+        self.created_utc = payload['created_utc']
+        self.permalink = payload['permalink']
+        self.author = SimpleNamespace(name=payload['author']) if payload['author'] else None
+        self.subreddit = SimpleNamespace(display_name=payload['subreddit'])
+
+
+class FakeSubreddit:
+    """Serves search and /new listings from the backend's submission pools."""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.display_name = name
+        self.names = name.split('+')
+
+    def search(self, query, time_filter='week', limit=10, **kwargs):
+        self.backend.api_call('search', pages=1)
+        rng = random.Random(f"{self.display_name}|{query}")
+        pools = [self.backend.pool(name) for name in self.names]
+        for i in range(limit):
+            pool = pools[i % len(pools)]
+            if pool:
+                yield FakeSubmission(rng.choice(pool))
+
+    def new(self, limit=100, params=None, **kwargs):
+        posts = sorted((p for name in self.names for p in self.backend.pool(name)),
+                       key=lambda p: p['created_utc'], reverse=True)
+        after = (params or {}).get('after')
+        if after:
+            ids = [p['fullname'] for p in posts]
+            posts = posts[ids.index(after) + 1:] if after in ids else []
+        for i, payload in enumerate(posts[:limit]):
+            if i % 100 == 0:
+                self.backend.api_call('new', pages=1)
+            yield FakeSubmission(payload)
+
+
+class FakeReddit:
+    """Stand-in for praw.Reddit with configurable volume and per-request latency."""
+
+    def __init__(self, payloads=None, vocabulary=None, volume=500, latency=0.05, seed=42):
+        self.latency = latency
+        self.vocabulary = vocabulary or FILLER
+        self.calls = defaultdict(int)
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.volume = volume
+        self.pools = defaultdict(list)
+        self.by_id = {}
+        for payload in payloads or []:
+            self._add(payload)
+        self.synthetic = not payloads
+
+    def _add(self, payload):
+        self.pools[payload['subreddit'].lower()].append(payload)
+        self.by_id[payload['id']] = payload
+
+    def populate(self, subreddits):
+        """Generate synthetic pools up front so runs are reproducible."""
+        for name in subreddits:
+            self.pool(name)
+
+    def pool(self, name):
+        """Return a subreddit's posts, generating synthetic ones on first use."""
+        key = name.lower()
+        if self.synthetic and key not in self.pools:
+            with self.lock:
+                if key not in self.pools:
+                    for _ in range(self.volume):
+                        self._add(self._synthetic_payload(name))
+        return self.pools.get(key, [])
+
+    def _synthetic_payload(self, subreddit):
+        rng = self.rng
+        vocab = self.vocabulary
+        submission_id = f"b{len(self.by_id):06x}"
+        words = lambda n: " ".join(rng.choice(vocab if rng.random() < 0.3 else FILLER) for _ in range(n))
+        return {
+            'id': submission_id,
+            'fullname': f"t3_{submission_id}",
+            'title': words(rng.randint(5, 14)),
+            'selftext': words(rng.randint(0, 200)),
+            'score': rng.randint(0, 200),
+            'num_comments': rng.randint(0, 80),
+            'created_utc': time.time() - rng.uniform(0, 8 * 86400),
+            'permalink': f"/r/{subreddit}/comments/{submission_id}/post/",
+            'author': f"trader{rng.randint(0, 999)}" if rng.random() > 0.05 else None,
+            'subreddit': subreddit,
+        }
+
+    def api_call(self, kind, pages=1):
+        with self.lock:
+            self.calls[kind] += pages
+        time.sleep(self.latency * pages)
+
+    def subreddit(self, name):
+        return FakeSubreddit(self, name)
+
+    def info(self, fullnames=None):
+        self.api_call('info')
+        for fullname in fullnames or []:
+            payload = self.by_id.get(fullname[3:])
+            if payload:
+                yield FakeSubmission(payload)
+
+
+def vocabulary_from_config(config_path):
+    """Words that drive intent, keyword and feature matches in scoring."""
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    words = [w for phrase in config.get('keywords_core', []) for w in phrase.lower().split()]
+    words += [kw.lower() for kw in RedditLeadFinder.FEATURE_KEYWORDS]
+    words += ["best", "recommend", "looking for", "how to", "stuck", "built", "giveaway"]
+    return words
+
+
+def load_fixture(path):
+    """Load recorded payloads from a JSON list or a SubmissionCache database."""
+    if path.endswith(('.sqlite', '.db')):
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT payload FROM submissions").fetchall()
+        conn.close()
+        return [json.loads(row[0]) for row in rows]
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class StageTimer:
+    """Wraps finder methods to accumulate call counts and wall time per stage."""
+
+    STAGES = {
+        'fetch': ['_search_live', '_run_new', '_fetch_volatile'],
+        'score': ['_calculate_relevance_score'],
+        'risk': ['_assess_risks'],
+        'draft': ['_generate_reply_drafts'],
+    }
+
+    def __init__(self, finder):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.lock = threading.Lock()
+        for stage, methods in self.STAGES.items():
+            for method in methods:
+                if hasattr(finder, method):
+                    setattr(finder, method, self._wrap(stage, getattr(finder, method)))
+
+    def _wrap(self, stage, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.seconds[stage] += time.perf_counter() - start
+                    self.calls[stage] += 1
+        return timed
+
+
+def build_finder(args, backend, overrides, workdir):
+    """Create a finder whose Reddit clients are all the fake backend."""
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+    # Keep run state out of the working tree, and search the same keywords
+    # every run so modes are comparable
+    config['keyword_scheduler'] = {'enabled': False}
+    config['rate_limits'] = {**config.get('rate_limits', {}),
+                             'history_path': os.path.join(workdir, 'reply_history.sqlite')}
+    config.update(overrides)
+    config_path = os.path.join(workdir, 'benchmark_config.json')
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+
+    finder = RedditLeadFinder(config_path)
+    finder._build_reddit = lambda: backend
+    finder.reddit = backend
+    backend.populate(finder._subreddits_to_search())
+    return finder
+
+
+def make_backend(args, payloads):
+    return FakeReddit(payloads, vocabulary=vocabulary_from_config(args.config),
+                      volume=args.volume, latency=args.latency, seed=args.seed)
+
+
+def run_mode(mode, args, payloads, workdir):
+    """Run one pipeline mode against a fresh backend and return its report."""
+    backend = make_backend(args, payloads)
+    overrides = {'search_concurrency': args.concurrency}
+    if not args.respect_rate_limit:
+        overrides['requests_per_minute'] = 10 ** 9
+
+    if mode == 'cached':
+        overrides['cache'] = {'enabled': True, 'path': os.path.join(workdir, 'cache.sqlite')}
+        # Warm the cache first; the measured run is the repeat
+        build_finder(args, backend, overrides, workdir).search_reddit(limit=args.limit)
+        backend.calls.clear()
+    elif mode == 'incremental':
+        overrides['incremental'] = {'state_path': os.path.join(workdir, 'watermarks.json')}
+
+    finder = build_finder(args, backend, overrides, workdir)
+    timer = StageTimer(finder)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == 'incremental':
+        results = finder.search_new(limit=args.limit)
+    else:
+        results = finder.search_reddit(limit=args.limit)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    scored = timer.calls['score']
+    return {
+        'mode': mode,
+        'seconds': round(elapsed, 3),
+        'submissions_scored': scored,
+        'scored_per_second': round(scored / elapsed, 1) if elapsed else None,
+        'duplicates_skipped': finder.stats['duplicates_skipped'],
+        'leads': len(results),
+        'api_calls': dict(backend.calls),
+        'api_calls_total': sum(backend.calls.values()),
+        'stage_seconds': {stage: round(timer.seconds[stage], 4) for stage in StageTimer.STAGES},
+        'peak_memory_mb': round(peak / 1e6, 2),
+    }
+
+
+def run_scoring_micro(args, payloads, workdir):
+    """Time scalar and batch scoring alone over every post in the backend."""
+    backend = make_backend(args, payloads)
+    finder = build_finder(args, backend, {}, workdir)
+    posts = [p for pool in backend.pools.values() for p in pool]
+
+    now = time.time()
+    start = time.perf_counter()
+    for p in posts:
+        finder._calculate_relevance_score(p['selftext'], p['title'], p['subreddit'],
+                                          p['created_utc'], p['score'], now=now)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    finder.score_batch(posts, now=now)
+    batch_elapsed = time.perf_counter() - start
+    return {
+        'mode': 'scoring',
+        'seconds': round(elapsed, 3),
+        'submissions_scored': len(posts),
+        'scored_per_second': round(len(posts) / elapsed, 1) if elapsed else None,
+        'batch_seconds': round(batch_elapsed, 3),
+        'batch_scored_per_second': round(len(posts) / batch_elapsed, 1) if batch_elapsed else None,
+    }
+
+
+def print_report(report):
+    print(f"\n⏱️  {report['mode']}")
+    for key, value in report.items():
+        if key != 'mode':
+            print(f"  {key}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lead pipeline offline")
+    parser.add_argument('--config', default='config.json', help="Path to config.json")
+    parser.add_argument('--modes', default='search,incremental,cached,scoring',
+                        help="Comma-separated modes: search, incremental, cached, scoring")
+    parser.add_argument('--fixture', help="Recorded payloads (JSON list or cache .sqlite)")
+    parser.add_argument('--volume', type=int, default=500,
+                        help="Synthetic posts per subreddit")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="Simulated seconds per API request")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--respect-rate-limit', action='store_true',
+                        help="Keep the configured requests_per_minute instead of disabling it")
+    parser.add_argument('--json', help="Write the reports to this JSON file")
+    args = parser.parse_args()
+
+    # Fake credentials; the fake backend never talks to Reddit
+    os.environ.setdefault('REDDIT_CLIENT_ID', 'benchmark')
+    os.environ.setdefault('REDDIT_CLIENT_SECRET', 'benchmark')
+
+    payloads = load_fixture(args.fixture) if args.fixture else None
+
+    print("=" * 60)
+    print("Reddit Lead Finder - Benchmark")
+    print("=" * 60)
+
+    reports = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes.split(','):
+            mode = mode.strip()
+            if mode == 'scoring':
+                report = run_scoring_micro(args, payloads, workdir)
+            else:
+                report = run_mode(mode, args, payloads, workdir)
+            print_report(report)
+            reports.append(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n💾 Reports saved to {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,34 +4,834 @@ Reddit Lead Finder + Reply Writer for TradingWizard.ai
 Discovers relevant Reddit opportunities and drafts helpful, value-first replies.
 """
 
-import praw
 import json
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, TYPE_CHECKING
 import re
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, deque
 import time
+import random
+import threading
+import argparse
+import sqlite3
+import gzip
+import heapq
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# praw, requests and numpy are imported where they are first needed, so
+# offline commands (score, draft, rerank) start fast and need no credentials;
+# praw is only imported here for type annotations
+if TYPE_CHECKING:
+    import praw
+
+
+def _ensure_parent_dir(path: str):
+    """Create the directory a file path lives in, if it has one."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all search workers.
+    
+    Reddit allows ~100 requests per minute per OAuth client; every worker
+    takes a token before hitting the API so the pool as a whole stays under it.
+    """
+    
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResilientSession:
+    """Pooled HTTP session shared by every PRAW client of a finder.
+    
+    Connections are kept alive in a pool sized for the search workers.
+    Rate-limited (429) responses are retried with capped exponential backoff
+    and full jitter, honoring Retry-After. 5xx responses and connection
+    errors are left to prawcore, which already retries them, so the two
+    layers never multiply. Reddit's X-Ratelimit-Remaining/Reset headers are
+    tracked across all clients so that when the shared quota runs low every
+    worker pauses until the window resets, instead of running into a burst
+    of 429s.
+    
+    Wraps a requests.Session. Retries apply to request(), the one method
+    prawcore calls; anything else (headers, close) is passed through.
+    """
+    
+    RETRY_STATUSES = {429}
+    
+    def __init__(self, pool_size: int = 16, max_retries: int = 4, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, min_remaining: float = 5, on_retry=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_remaining = min_remaining
+        self.on_retry = on_retry
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    def __getattr__(self, name):
+        if name == 'session':
+            raise AttributeError(name)
+        return getattr(self.session, name)
+    
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+        while True:
+            self._wait_for_quota()
+            response = self.session.request(method, url, *args, **kwargs)
+            self._track_ratelimit(response)
+            if response.status_code not in self.RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+            self._backoff(attempt, response)
+            attempt += 1
+    
+    def _backoff(self, attempt: int, response):
+        """Sleep before the next attempt and report the retry."""
+        if self.on_retry:
+            self.on_retry(response.status_code)
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get('retry-after')
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay)
+    
+    def _track_ratelimit(self, response):
+        """Pause all requests until the window resets when the quota runs low."""
+        try:
+            remaining = float(response.headers['x-ratelimit-remaining'])
+            reset = float(response.headers['x-ratelimit-reset'])
+        except (KeyError, ValueError):
+            return
+        if remaining < self.min_remaining:
+            with self.lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+    
+    def _wait_for_quota(self):
+        with self.lock:
+            wait = self.paused_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Stop calling a subreddit that keeps failing, then probe it again later.
+    
+    After ``failure_threshold`` consecutive failures a key is open and
+    skipped. Once ``reset_seconds`` have passed calls are let through again;
+    the next failure re-opens it, a success closes it.
+    """
+    
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 300):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = defaultdict(int)
+        self.opened_at = {}
+        self.lock = threading.Lock()
+    
+    def allow(self, key: str) -> bool:
+        with self.lock:
+            opened_at = self.opened_at.get(key)
+            return opened_at is None or time.monotonic() - opened_at >= self.reset_seconds
+    
+    def record_success(self, key: str):
+        with self.lock:
+            self.failures.pop(key, None)
+            self.opened_at.pop(key, None)
+    
+    def record_failure(self, key: str):
+        with self.lock:
+            self.failures[key] += 1
+            if self.failures[key] >= self.failure_threshold:
+                self.opened_at[key] = time.monotonic()
+
+
+class KeywordMatcher:
+    """Find every occurrence of a fixed set of literal phrases in one pass.
+    
+    The phrases are compiled into a single trie-shaped regex inside a lookahead,
+    so each text position is checked once for the longest phrase starting there.
+    Shorter phrases that are prefixes of that hit come from a precomputed table,
+    which makes the result the same as testing ``phrase in text`` for each phrase.
+    """
+    
+    def __init__(self, phrases: List[str]):
+        self.phrases = list(dict.fromkeys(p for p in phrases if p))
+        phrase_set = set(self.phrases)
+        self.prefixes = {p: [p[:i] for i in range(1, len(p) + 1) if p[:i] in phrase_set]
+                         for p in self.phrases}
+        
+        trie = {}
+        for phrase in self.phrases:
+            node = trie
+            for ch in phrase:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self.pattern = re.compile('(?=(' + self._trie_regex(trie) + '))') if self.phrases else None
+    
+    @classmethod
+    def _trie_regex(cls, node: Dict) -> str:
+        """Render a trie node as a regex that prefers the longest phrase."""
+        branches = [re.escape(ch) + cls._trie_regex(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+    
+    def find_all(self, text: str) -> set:
+        """Return the set of phrases that occur anywhere in text."""
+        hits = set()
+        if self.pattern is None:
+            return hits
+        for match in self.pattern.finditer(text):
+            hits.update(self.prefixes[match.group(1)])
+        return hits
+
+
+class SubmissionCache:
+    """SQLite cache of submission payloads and search-result id lists.
+    
+    Search results are keyed by (subreddits, query, time_filter, limit) and
+    expire after ``search_ttl_minutes``. Submission payloads are kept until
+    evicted, but their volatile fields (score, comment count) are considered
+    stale after ``volatile_ttl_minutes``. Both tables are bounded by
+    ``max_entries`` with least-recently-used eviction.
+    """
+    
+    VOLATILE_FIELDS = ('score', 'num_comments')
+    
+    def __init__(self, path: str, search_ttl_minutes: float = 60,
+                 volatile_ttl_minutes: float = 15, max_entries: int = 20000):
+        _ensure_parent_dir(path)
+        self.search_ttl = search_ttl_minutes * 60
+        self.volatile_ttl = volatile_ttl_minutes * 60
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                refreshed_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                ids TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS submissions_accessed ON submissions (accessed_at);
+            CREATE INDEX IF NOT EXISTS searches_accessed ON searches (accessed_at);
+        """)
+    
+    @staticmethod
+    def search_key(subreddits: List[str], query: str, time_filter: str, limit: int) -> str:
+        return json.dumps(["+".join(subreddits), query, time_filter, limit])
+    
+    def get_search(self, key: str, allow_stale: bool = False) -> Optional[List[str]]:
+        """Return cached result ids for a search, or None if missing/expired."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT ids, fetched_at FROM searches WHERE key = ?", (key,)).fetchone()
+            if row is None or (not allow_stale and now - row[1] > self.search_ttl):
+                return None
+            self.conn.execute("UPDATE searches SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return json.loads(row[0])
+    
+    def get_submissions(self, ids: List[str]) -> tuple:
+        """Return (payloads in id order, ids whose volatile fields are stale)."""
+        if not ids:
+            return [], []
+        now = time.time()
+        with self.lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = self.conn.execute(
+                f"SELECT id, payload, refreshed_at FROM submissions WHERE id IN ({placeholders})",
+                ids).fetchall()
+            self.conn.execute(
+                f"UPDATE submissions SET accessed_at = ? WHERE id IN ({placeholders})",
+                [now] + list(ids))
+            self.conn.commit()
+        found = {row[0]: (json.loads(row[1]), row[2]) for row in rows}
+        payloads = [found[i][0] for i in ids if i in found]
+        stale = [i for i in ids if i in found and now - found[i][1] > self.volatile_ttl]
+        return payloads, stale
+    
+    def put_search(self, key: str, payloads: List[Dict]):
+        """Store a search's result ids together with their payloads."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO searches (key, ids, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps([p['id'] for p in payloads]), now, now))
+            self._put_payloads(payloads, now)
+            self._evict()
+            self.conn.commit()
+    
+    def refresh_volatile(self, updates: Dict[str, Dict]):
+        """Overwrite only the volatile fields of cached payloads."""
+        now = time.time()
+        with self.lock:
+            for submission_id, fields in updates.items():
+                row = self.conn.execute(
+                    "SELECT payload FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+                if row is None:
+                    continue
+                payload = json.loads(row[0])
+                payload.update({k: fields[k] for k in self.VOLATILE_FIELDS if k in fields})
+                self.conn.execute(
+                    "UPDATE submissions SET payload = ?, refreshed_at = ? WHERE id = ?",
+                    (json.dumps(payload), now, submission_id))
+            self.conn.commit()
+    
+    def _put_payloads(self, payloads: List[Dict], now: float):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO submissions (id, payload, refreshed_at, accessed_at) VALUES (?, ?, ?, ?)",
+            [(p['id'], json.dumps(p), now, now) for p in payloads])
+    
+    def _evict(self):
+        """Drop least-recently-used rows beyond max_entries."""
+        for table, key in (('submissions', 'id'), ('searches', 'key')):
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE {key} IN ("
+                f"SELECT {key} FROM {table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+
+class ReplyHistory:
+    """Persistent record of posted replies, used to enforce rate_limits.
+    
+    Replies are stored in SQLite and loaded into three in-memory indexes on
+    open: replies per thread, replies per subreddit per UTC day, and the
+    latest reply per author. Each eligibility check is a few dict lookups, so
+    it can run on every candidate before any scoring work is done. Replies
+    committed by another process (e.g. ``--record-reply`` while ``--stream``
+    runs) are picked up on the next check: SQLite's ``data_version`` tells
+    when to index the rows added since.
+    """
+    
+    def __init__(self, path: str, max_per_thread: int = 1, max_per_subreddit_per_day: int = 3,
+                 author_cooldown_hours: float = 48):
+        _ensure_parent_dir(path)
+        self.max_per_thread = max_per_thread
+        self.max_per_subreddit_per_day = max_per_subreddit_per_day
+        self.author_cooldown = author_cooldown_hours * 3600
+        self.by_thread = defaultdict(int)
+        self.by_subreddit_day = defaultdict(int)
+        self.author_last = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS replies (
+                thread_id TEXT NOT NULL,
+                subreddit TEXT NOT NULL,
+                author TEXT,
+                replied_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS replies_thread ON replies (thread_id);
+            CREATE INDEX IF NOT EXISTS replies_subreddit ON replies (subreddit, replied_at);
+            CREATE INDEX IF NOT EXISTS replies_author ON replies (author, replied_at);
+        """)
+        self.data_version = None
+        self.last_rowid = 0
+        self.refresh()
+    
+    def refresh(self):
+        """Index replies that other connections committed since the last check."""
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self.data_version:
+                self.data_version = version
+                self._index_new_rows()
+    
+    def _index_new_rows(self):
+        rows = self.conn.execute(
+            "SELECT rowid, thread_id, subreddit, author, replied_at FROM replies WHERE rowid > ? ORDER BY rowid",
+            (self.last_rowid,)).fetchall()
+        for rowid, *row in rows:
+            self._index(*row)
+            self.last_rowid = rowid
+    
+    @staticmethod
+    def _day(timestamp: float) -> str:
+        return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+    
+    def _index(self, thread_id: str, subreddit: str, author: Optional[str], replied_at: float):
+        self.by_thread[thread_id] += 1
+        self.by_subreddit_day[(subreddit, self._day(replied_at))] += 1
+        if author:
+            self.author_last[author] = max(self.author_last.get(author, 0), replied_at)
+    
+    def blocked_reason(self, thread_id: str, subreddit: str, author: Optional[str],
+                       now: Optional[float] = None) -> Optional[str]:
+        """Return why we may not reply to this thread now, or None if we may."""
+        self.refresh()
+        now = now or time.time()
+        subreddit = subreddit.lower()
+        author = author.lower() if author else None
+        if self.by_thread.get(thread_id, 0) >= self.max_per_thread:
+            return 'reply_thread'
+        if self._capped(subreddit, now):
+            return 'reply_subreddit'
+        if author and now - self.author_last.get(author, float('-inf')) < self.author_cooldown:
+            return 'reply_author'
+        return None
+    
+    def subreddit_capped(self, subreddit: str, now: Optional[float] = None) -> bool:
+        """Whether today's reply cap for a subreddit is used up."""
+        self.refresh()
+        return self._capped(subreddit.lower(), now or time.time())
+    
+    def _capped(self, subreddit: str, now: float) -> bool:
+        return self.by_subreddit_day.get((subreddit, self._day(now)), 0) >= self.max_per_subreddit_per_day
+    
+    def record(self, thread_id: str, subreddit: str, author: Optional[str],
+               replied_at: Optional[float] = None):
+        """Log a reply we posted to a thread."""
+        replied_at = replied_at or time.time()
+        subreddit = subreddit.lower()
+        author = author.lower() if author else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO replies (thread_id, subreddit, author, replied_at) VALUES (?, ?, ?, ?)",
+                (thread_id, subreddit, author, replied_at))
+            self.conn.commit()
+            # Also picks up rows other connections added before ours
+            self._index_new_rows()
+
+
+class JSONLSink:
+    """Append each lead to a newline-delimited JSON file as soon as it qualifies.
+    
+    Every line is flushed immediately so consumers can tail the file while a
+    run is in progress, and a crash loses at most the lead being written.
+    """
+    
+    def __init__(self, path: str, compact: bool = False, compress: bool = False,
+                 append: bool = True):
+        self.path = path
+        self.separators = (',', ':') if compact else None
+        mode = 'at' if append else 'wt'
+        self.file = gzip.open(path, mode) if compress else open(path, mode)
+    
+    def write(self, lead: Dict):
+        self.file.write(json.dumps(lead, separators=self.separators) + "\n")
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+
+class TopNSink:
+    """Keep only the N highest-scoring leads in memory for the final ranked view.
+    
+    Leads are deduplicated by URL on insert (a better-scoring copy replaces the
+    old one), and ties keep the earlier lead, matching a stable sort of the full
+    list. Each lead can carry an opaque item, e.g. the context needed to draft
+    replies later.
+    """
+    
+    def __init__(self, n: int):
+        self.n = n
+        self.heap = []
+        self.entries = {}
+        self.counter = 0
+    
+    def write(self, lead: Dict, item=None):
+        self.counter += 1
+        entry = (lead['relevance_score'], -self.counter, lead, item)
+        
+        existing = self.entries.get(lead['url'])
+        if existing is not None:
+            if entry[0] <= existing[0]:
+                return
+            self.heap.remove(existing)
+            heapq.heapify(self.heap)
+            del self.entries[lead['url']]
+        
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            evicted = heapq.heapreplace(self.heap, entry)
+            del self.entries[evicted[2]['url']]
+        else:
+            return
+        self.entries[lead['url']] = entry
+    
+    def ranked_items(self) -> List[tuple]:
+        """Return (lead, item) pairs, best first."""
+        return [(lead, item) for _, _, lead, item in sorted(self.heap, key=lambda e: (-e[0], -e[1]))]
+    
+    def ranked(self) -> List[Dict]:
+        return [lead for lead, _ in self.ranked_items()]
+    
+    def close(self):
+        pass
+
+
+class RunMetrics:
+    """Thread-safe counters and stage timers for one pipeline run.
+    
+    Counters keep an overall total plus optional per-label breakdowns (e.g. by
+    subreddit or keyword); timers accumulate seconds and call counts per stage.
+    """
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self.totals = defaultdict(int)
+        self.labeled = defaultdict(int)
+        self.timers = defaultdict(lambda: [0.0, 0])
+        self.lock = threading.Lock()
+    
+    def incr(self, name: str, value: int = 1, **labels):
+        with self.lock:
+            self.totals[name] += value
+            for label, label_value in labels.items():
+                self.labeled[(name, label, str(label_value))] += value
+    
+    def by_label(self, name: str, label: str) -> Dict[str, int]:
+        """Return one counter's breakdown for a label, e.g. qualified by keyword."""
+        with self.lock:
+            return {label_value: value for (n, l, label_value), value in self.labeled.items()
+                    if n == name and l == label}
+    
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.timers[stage][0] += elapsed
+                self.timers[stage][1] += 1
+    
+    def to_dict(self) -> Dict:
+        """Build the JSON run report."""
+        counters = {name: {'total': total} for name, total in self.totals.items()}
+        for (name, label, label_value), value in sorted(self.labeled.items()):
+            counters[name].setdefault(f"by_{label}", {})[label_value] = value
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'duration_seconds': round(time.time() - self.started_at, 3),
+            'counters': counters,
+            'timers': {stage: {'seconds': round(seconds, 4), 'count': count}
+                       for stage, (seconds, count) in self.timers.items()},
+        }
+    
+    def to_prometheus(self, prefix: str = 'reddit_lead_finder') -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        def escape(value):
+            return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        
+        series = defaultdict(list)
+        for (name, label, label_value), value in sorted(self.labeled.items()):
+            series[f"{prefix}_{name}_by_{label}_total"].append(
+                f'{{{label}="{escape(label_value)}"}} {value}')
+        for name, total in self.totals.items():
+            series[f"{prefix}_{name}_total"].append(f" {total}")
+        
+        lines = []
+        for metric in sorted(series):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(metric + sample for sample in series[metric])
+        
+        lines.append(f"# TYPE {prefix}_stage_seconds_total counter")
+        for stage, (seconds, _) in sorted(self.timers.items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}')
+        lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+        for stage, (_, count) in sorted(self.timers.items()):
+            lines.append(f'{prefix}_stage_calls_total{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+    
+    def save(self, report_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        if report_path:
+            with open(report_path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        if prometheus_path:
+            with open(prometheus_path, 'w') as f:
+                f.write(self.to_prometheus())
+
+
+class KeywordScheduler:
+    """Choose which keywords to search each run, based on their past yield.
+    
+    Yield is qualified leads per API call. A keyword packed into a combined
+    query is charged an equal share of each live search for it (cache hits
+    and searches skipped by a circuit breaker cost nothing), and is only
+    credited with leads it literally occurs in. Most of the budget goes to
+    the highest-yield keywords. A few exploration slots rotate in whichever
+    remaining keywords were searched longest ago (never-searched first), so
+    low-yield keywords still get re-tested over time. Ties fall back to the
+    keyword list order, so the same stats always give the same schedule.
+    """
+    
+    def __init__(self, path: str, exploration_slots: int = 2):
+        self.path = path
+        self.exploration_slots = exploration_slots
+        self.load()
+    
+    def load(self):
+        """(Re)read the stats file, e.g. before recording into a file shared by several configs."""
+        self.stats = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.stats = json.load(f)
+    
+    def keyword_yield(self, keyword: str) -> float:
+        stats = self.stats.get(keyword, {})
+        # Laplace smoothing keeps unseen keywords competitive until measured
+        return (stats.get('qualified', 0) + 1) / (stats.get('api_calls', 0) + 1)
+    
+    def select(self, keywords: List[str], budget: int) -> List[str]:
+        """Return up to ``budget`` keywords in priority order."""
+        order = {kw: i for i, kw in enumerate(keywords)}
+        explore = min(self.exploration_slots, max(0, budget - 1))
+        
+        by_yield = sorted(keywords, key=lambda kw: (-self.keyword_yield(kw), order[kw]))
+        chosen = by_yield[:budget - explore]
+        
+        rest = [kw for kw in keywords if kw not in set(chosen)]
+        rest.sort(key=lambda kw: (self.stats.get(kw, {}).get('last_run', 0), order[kw]))
+        return chosen + rest[:explore]
+    
+    def record(self, plans: List[Dict], qualified: Dict[str, int], searches: Dict[str, int],
+               keywords: Optional[List[str]] = None):
+        """Update stats after a run from its plans, per-keyword leads and live searches.
+        
+        ``searches`` counts the live search calls that included each keyword;
+        every one is charged at the keyword's share of its OR pack. With
+        ``keywords`` only those keywords are updated (packs shared with
+        other configs keep their full size).
+        """
+        now = time.time()
+        pack_size = {kw: len(plan['keywords']) for plan in plans for kw in plan['keywords']
+                     if keywords is None or kw in keywords}
+        for keyword, size in pack_size.items():
+            stats = self.stats.setdefault(keyword, {'api_calls': 0, 'qualified': 0, 'runs': 0})
+            stats['api_calls'] += searches.get(keyword, 0) / size
+            stats['runs'] += 1
+            stats['last_run'] = now
+        for keyword, count in qualified.items():
+            if keywords is not None and keyword not in keywords:
+                continue
+            stats = self.stats.setdefault(keyword, {'api_calls': 0, 'qualified': 0, 'runs': 0})
+            stats['qualified'] += count
+    
+    def save(self):
+        _ensure_parent_dir(self.path)
+        with open(self.path, 'w') as f:
+            json.dump(self.stats, f, indent=2, sort_keys=True)
+
 
 class RedditLeadFinder:
+    # Intent patterns in priority order; the first match sets the label
+    INTENT_PATTERNS = {
+        'tool-seeking': r'(recommend|best|looking for|suggest|which|what.*use|any good|need.*tool)',
+        'how-to': r'(how to|how do|how can|guide|tutorial|help me|teach)',
+        'problem-solving': r'(problem|issue|stuck|struggling|confused|not working|error)',
+        'show-and-tell': r'(built|made|created|check out|my.*tool)',
+    }
+    
+    FEATURE_KEYWORDS = ['chart', 'technical analysis', 'AI', 'automat', 'algo', 
+                        'signal', 'backtest', 'scan', 'indicator', 'strategy']
+    
+    # Default scoring weights; override any of them with "scoring_weights" in config.json
+    SCORING_WEIGHTS = {
+        'intent_match': 40,
+        'intent_default': 20,
+        'keyword_per_match': 2,
+        'keyword_max': 20,
+        'feature_per_match': 5,
+        'feature_max': 25,
+        'freshness_tiers': [[1, 10], [3, 7], [7, 5]],  # [max age in days, points]
+        'subreddit_quality': 5,
+        'subreddit_default': 3,
+    }
+    
+    QUALITY_SUBS = ['algotrading', 'trading', 'daytrading', 'stocks', 'investing', 
+                    'wallstreetbets', 'forex', 'cryptocurrency', 'bitcoin']
+    
     def __init__(self, config_path: str = "config.json"):
         """Initialize the Reddit Lead Finder with configuration."""
         with open(config_path, 'r') as f:
             self.config = json.load(f)
         
-        # Initialize Reddit API
-        self.reddit = praw.Reddit(
-            client_id=os.getenv('REDDIT_CLIENT_ID'),
-            client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-            user_agent=os.getenv('REDDIT_USER_AGENT', 'TradingWizard Lead Finder v1.0')
+        # Per-run metrics, also fed by the HTTP layer's retry hook
+        self.metrics = RunMetrics()
+        
+        # The HTTP transport and Reddit API client are created on first use, so
+        # offline commands never import praw or need credentials
+        self._http_session = None
+        self._reddit = None
+        self._client_lock = threading.Lock()
+        http_config = self.config.get('http', {})
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=http_config.get('circuit_failure_threshold', 3),
+            reset_seconds=http_config.get('circuit_reset_seconds', 300)
         )
         
+        # Per-thread clients and a shared limiter for concurrent searches
+        self._thread_local = threading.local()
+        self.rate_limiter = TokenBucket(
+            self.config.get('requests_per_minute', 100),
+            burst=self.concurrency
+        )
+        
+        # Local cache of fetched submissions and search results
+        cache_config = self.config.get('cache', {})
+        self.offline = cache_config.get('offline', False)
+        self.cache = None
+        if cache_config.get('enabled', False) or self.offline:
+            self.cache = SubmissionCache(
+                cache_config.get('path', '.cache/reddit_cache.sqlite'),
+                search_ttl_minutes=cache_config.get('search_ttl_minutes', 60),
+                volatile_ttl_minutes=cache_config.get('volatile_ttl_minutes', 15),
+                max_entries=cache_config.get('max_entries', 20000)
+            )
+        
+        # Scoring weights and funnel thresholds
+        self.weights = {**self.SCORING_WEIGHTS, **self.config.get('scoring_weights', {})}
+        self.date_range_days = self.config.get('date_range_days', 7)
+        self.min_upvotes = self.config.get('min_upvotes', 3)
+        self.relevance_threshold = self.config.get('relevance_threshold', 60)
+        self.max_results = self.config.get('max_results', 25)
+        self.search_keyword_limit = self.config.get('search_keyword_limit', 10)
+        
         # Expand keywords automatically
         self.keywords = self._expand_keywords()
         
-        # Track replies for rate limiting
-        self.reply_tracker = defaultdict(list)
+        # Yield-based keyword scheduling across runs
+        scheduler_config = self.config.get('keyword_scheduler', {})
+        self.keyword_scheduler = None
+        if scheduler_config.get('enabled', False):
+            self.keyword_scheduler = KeywordScheduler(
+                scheduler_config.get('stats_path', '.cache/keyword_stats.json'),
+                exploration_slots=scheduler_config.get('exploration_slots', 2)
+            )
+        self._build_matchers()
+        
+        # Replies already posted, checked against rate_limits before scoring
+        rate_limits = self.config.get('rate_limits', {})
+        self.reply_history = ReplyHistory(
+            rate_limits.get('history_path', '.cache/reply_history.sqlite'),
+            max_per_thread=rate_limits.get('max_replies_per_thread', 1),
+            max_per_subreddit_per_day=rate_limits.get('max_replies_per_subreddit_per_day', 3),
+            author_cooldown_hours=rate_limits.get('cooldown_hours_per_author', 48)
+        )
         
+        # Extra outputs that receive each lead as soon as it qualifies, and an
+        # optional log of every fetched candidate for offline re-ranking
+        self.sinks = []
+        self.candidate_log = None
+        
+        # The keywords that found each submission in the current run
+        self.found_by = {}
+        
+    def _open_stream_sink(self, path: str) -> JSONLSink:
+        """Open a JSONL sink using the compact/gzip settings from config."""
+        output_config = self.config.get('output', {})
+        compress = output_config.get('gzip', False)
+        if compress and not path.endswith('.gz'):
+            path += '.gz'
+        return JSONLSink(path, compact=output_config.get('compact', False), compress=compress)
+    
+    @property
+    def http_session(self) -> ResilientSession:
+        """Pooled, retrying transport shared by every Reddit client."""
+        with self._client_lock:
+            if self._http_session is None:
+                http_config = self.config.get('http', {})
+                self._http_session = ResilientSession(
+                    pool_size=http_config.get('pool_size', max(16, self.concurrency)),
+                    max_retries=http_config.get('max_retries', 4),
+                    backoff_base=http_config.get('backoff_base_seconds', 1.0),
+                    backoff_max=http_config.get('backoff_max_seconds', 60.0),
+                    min_remaining=http_config.get('min_ratelimit_remaining', 5),
+                    on_retry=self._record_retry
+                )
+            return self._http_session
+    
+    @property
+    def reddit(self) -> 'praw.Reddit':
+        """Reddit API client for the calling (main) thread, built on first use."""
+        if self._reddit is None:
+            self._reddit = self._build_reddit()
+        return self._reddit
+    
+    @reddit.setter
+    def reddit(self, client):
+        self._reddit = client
+    
+    @property
+    def concurrency(self) -> int:
+        """Worker threads for concurrent API requests."""
+        return max(1, int(self.config.get('search_concurrency', 8)))
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Overall counter totals for the current run."""
+        return self.metrics.totals
+    
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        response = getattr(error, 'response', None)
+        return getattr(response, 'status_code', None) == 429
+    
+    def _record_error(self, stage: str, error: Exception, **labels):
+        self.metrics.incr('errors', stage=stage, **labels)
+        if self._is_rate_limited(error):
+            self.metrics.incr('rate_limited', stage=stage)
+    
+    def _record_retry(self, status):
+        """Count a retried HTTP request; called from the transport's worker threads."""
+        self.metrics.incr('retries', status=status)
+        if status == 429:
+            self.metrics.incr('rate_limited', stage='http')
+    
+    def _build_reddit(self) -> 'praw.Reddit':
+        """Create a Reddit API client from environment credentials."""
+        import praw
+        return praw.Reddit(
+            client_id=os.getenv('REDDIT_CLIENT_ID'),
+            client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
+            user_agent=os.getenv('REDDIT_USER_AGENT', 'TradingWizard Lead Finder v1.0'),
+            requestor_kwargs={'session': self.http_session}
+        )
+    
     def _expand_keywords(self) -> List[str]:
         """Expand core keywords with variants and intent phrases."""
         core = self.config.get('keywords_core', [])
@@ -96,65 +896,208 @@ class RedditLeadFinder:
         ]
         expanded.extend(intent_phrases)
         
-        return list(set(expanded))[:50]  # Limit to 50 unique keywords
+        # Limit to 50 unique keywords, keeping first-seen order so runs are reproducible
+        return list(dict.fromkeys(expanded))[:50]
+    
+    def _build_matchers(self):
+        """Precompile keyword, feature and intent matchers for scoring."""
+        self._keyword_index = defaultdict(list)
+        for i, keyword in enumerate(self.keywords):
+            self._keyword_index[keyword.lower()].append(i)
+        
+        # Feature keywords are matched verbatim against the lowercased text
+        self.phrase_matcher = KeywordMatcher(list(self._keyword_index) + self.FEATURE_KEYWORDS)
+        self.intent_patterns = [(label.title().replace('-', ' '), re.compile(pattern))
+                                for label, pattern in self.INTENT_PATTERNS.items()]
+    
+    def _keywords_in(self, hits: set) -> List[str]:
+        """Return the keywords among matcher hits, in self.keywords order."""
+        matched_indices = sorted(i for hit in hits for i in self._keyword_index.get(hit, ()))
+        return [self.keywords[i] for i in matched_indices]
+    
+    def _keywords_in_post(self, submission: Dict) -> List[str]:
+        """Return the keywords that occur in a payload's title or body."""
+        text_lower = (submission['title'] + " " + submission['selftext']).lower()
+        return self._keywords_in(self.phrase_matcher.find_all(text_lower))
     
     def _calculate_relevance_score(self, text: str, title: str, subreddit: str, 
-                                   created_utc: int, upvotes: int) -> tuple:
+                                   created_utc: int, upvotes: int,
+                                   now: Optional[float] = None) -> tuple:
         """Calculate relevance score (0-100) based on multiple factors."""
         text_lower = (text + " " + title).lower()
         
-        # Intent match (40%)
-        intent_patterns = {
-            'tool-seeking': r'(recommend|best|looking for|suggest|which|what.*use|any good|need.*tool)',
-            'how-to': r'(how to|how do|how can|guide|tutorial|help me|teach)',
-            'problem-solving': r'(problem|issue|stuck|struggling|confused|not working|error)',
-            'show-and-tell': r'(built|made|created|check out|my.*tool)',
-        }
+        w = self.weights
         
+        # Intent match (40%)
         intent_label = "General discussion"
-        intent_score = 20
+        intent_score = w['intent_default']
         
-        for label, pattern in intent_patterns.items():
-            if re.search(pattern, text_lower):
-                intent_label = label.title().replace('-', ' ')
-                intent_score = 40
+        for label, pattern in self.intent_patterns:
+            if pattern.search(text_lower):
+                intent_label = label
+                intent_score = w['intent_match']
                 break
         
+        # One pass finds every keyword and feature phrase in the text
+        hits = self.phrase_matcher.find_all(text_lower)
+        
         # Keyword density (20%)
-        matched_keywords = []
-        keyword_score = 0
-        for keyword in self.keywords:
-            if keyword.lower() in text_lower:
-                matched_keywords.append(keyword)
-                keyword_score += 2
-        keyword_score = min(keyword_score, 20)
+        matched_keywords = self._keywords_in(hits)
+        keyword_score = min(w['keyword_per_match'] * len(matched_keywords), w['keyword_max'])
         
         # Context fit for TradingWizard features (25%)
-        feature_keywords = ['chart', 'technical analysis', 'AI', 'automat', 'algo', 
-                          'signal', 'backtest', 'scan', 'indicator', 'strategy']
-        context_score = sum(5 for kw in feature_keywords if kw in text_lower)
-        context_score = min(context_score, 25)
+        context_score = sum(w['feature_per_match'] for kw in self.FEATURE_KEYWORDS if kw in hits)
+        context_score = min(context_score, w['feature_max'])
         
         # Freshness (10%)
-        age_days = (time.time() - created_utc) / 86400
-        if age_days < 1:
-            freshness_score = 10
-        elif age_days < 3:
-            freshness_score = 7
-        elif age_days < 7:
-            freshness_score = 5
-        else:
-            freshness_score = 0
+        age_days = ((time.time() if now is None else now) - created_utc) / 86400
+        freshness_score = 0
+        for max_age_days, points in w['freshness_tiers']:
+            if age_days < max_age_days:
+                freshness_score = points
+                break
         
         # Subreddit quality (5%)
-        quality_subs = ['algotrading', 'trading', 'daytrading', 'stocks', 'investing', 
-                       'wallstreetbets', 'forex', 'cryptocurrency', 'bitcoin']
-        subreddit_score = 5 if any(sub in subreddit.lower() for sub in quality_subs) else 3
+        is_quality = any(sub in subreddit.lower() for sub in self.QUALITY_SUBS)
+        subreddit_score = w['subreddit_quality'] if is_quality else w['subreddit_default']
         
         total_score = intent_score + keyword_score + context_score + freshness_score + subreddit_score
         
         return total_score, intent_label, matched_keywords
     
+    def batch_features(self, submissions: List[Dict],
+                       subreddit_names: Optional[List[str]] = None) -> Dict:
+        """Extract the text-derived scoring inputs for a batch of payloads.
+        
+        This is the expensive half of scoring (regex and phrase matching). The
+        result can be re-weighted cheaply by score_features, e.g. to re-score
+        cached posts many times while tuning.
+        
+        The lowercased texts are joined into one newline-separated string and
+        every intent pattern and phrase is searched across all of it at once;
+        after a hit the search jumps to the next post. Neither patterns nor
+        phrases can match a newline, so hits never span two posts.
+        """
+        import numpy as np
+        n = len(submissions)
+        names = subreddit_names or [s['subreddit'] for s in submissions]
+        texts = [(s['selftext'] + " " + s['title']).lower() for s in submissions]
+        
+        # First intent pattern in priority order, only searching still-unmatched posts
+        intent_index = np.full(n, -1, dtype=np.int8)
+        remaining = list(range(n))
+        for j, (_, pattern) in enumerate(self.intent_patterns):
+            joined, starts = self._join_texts([texts[i] for i in remaining])
+            hit = set()
+            match = pattern.search(joined)
+            while match:
+                k = bisect_right(starts, match.start()) - 1
+                hit.add(k)
+                match = pattern.search(joined, starts[k + 1])
+            intent_index[[remaining[k] for k in hit]] = j
+            remaining = [i for k, i in enumerate(remaining) if k not in hit]
+        
+        # (post, phrase) index pairs, one per phrase occurring in a post
+        joined, starts = self._join_texts(texts)
+        hit_post, hit_phrase = [], []
+        for c, phrase in enumerate(self.phrase_matcher.phrases):
+            pos = joined.find(phrase)
+            while pos != -1:
+                i = bisect_right(starts, pos) - 1
+                hit_post.append(i)
+                hit_phrase.append(c)
+                pos = joined.find(phrase, starts[i + 1])
+        hit_post = np.array(hit_post, dtype=np.int32)
+        hit_phrase = np.array(hit_phrase, dtype=np.int32)
+        order = np.argsort(hit_post, kind='stable')
+        
+        quality = {}
+        for name in names:
+            if name not in quality:
+                quality[name] = any(sub in name.lower() for sub in self.QUALITY_SUBS)
+        
+        return {
+            'intent_index': intent_index,
+            'hit_post': hit_post[order],
+            'hit_phrase': hit_phrase[order],
+            'created_utc': np.array([s['created_utc'] for s in submissions], dtype=float),
+            'quality_sub': np.array([quality[name] for name in names], dtype=bool),
+        }
+    
+    @staticmethod
+    def _join_texts(texts: List[str]) -> tuple:
+        """Join texts with newlines; return the string and each text's start offset plus the end."""
+        starts = [0]
+        for text in texts:
+            starts.append(starts[-1] + len(text) + 1)
+        return "\n".join(texts), starts
+    
+    def score_features(self, features: Dict, now: Optional[float] = None,
+                       threshold: Optional[int] = None,
+                       mask: Optional[List[bool]] = None) -> List[Optional[tuple]]:
+        """Turn batch_features output into (score, intent_label, matched_keywords).
+        
+        Entries scoring below ``threshold``, or left out by ``mask``, come back
+        as None.
+        """
+        import numpy as np
+        n = len(features['intent_index'])
+        if n == 0:
+            return []
+        now = time.time() if now is None else now
+        phrases = self.phrase_matcher.phrases
+        keyword_weights = np.array([len(self._keyword_index.get(p, ())) for p in phrases], dtype=np.int64)
+        feature_weights = np.array([p in self.FEATURE_KEYWORDS for p in phrases], dtype=np.int64)
+        hit_post, hit_phrase = features['hit_post'], features['hit_phrase']
+        
+        w = self.weights
+        
+        # Intent match (40%)
+        intent_score = np.where(features['intent_index'] >= 0, w['intent_match'], w['intent_default'])
+        
+        # Keyword density (20%) and context fit (25%): hit counts per post
+        keyword_hits = np.bincount(hit_post, weights=keyword_weights[hit_phrase], minlength=n)
+        feature_hits = np.bincount(hit_post, weights=feature_weights[hit_phrase], minlength=n)
+        keyword_score = np.minimum(w['keyword_per_match'] * keyword_hits.astype(np.int64), w['keyword_max'])
+        context_score = np.minimum(w['feature_per_match'] * feature_hits.astype(np.int64), w['feature_max'])
+        
+        # Freshness (10%)
+        age_days = (now - features['created_utc']) / 86400
+        tiers = w['freshness_tiers']
+        freshness_score = np.select([age_days < max_age for max_age, _ in tiers],
+                                    [points for _, points in tiers], 0)
+        
+        # Subreddit quality (5%)
+        subreddit_score = np.where(features['quality_sub'], w['subreddit_quality'], w['subreddit_default'])
+        
+        total_score = intent_score + keyword_score + context_score + freshness_score + subreddit_score
+        keep = total_score >= threshold if threshold is not None else np.ones(n, dtype=bool)
+        if mask is not None:
+            keep &= np.asarray(mask, dtype=bool)
+        
+        # Matched keyword lists are only built for the rows that are kept
+        results = [None] * n
+        labels = [label for label, _ in self.intent_patterns]
+        intent_index = features['intent_index']
+        bounds = np.searchsorted(hit_post, np.arange(n + 1))
+        for i in np.flatnonzero(keep).tolist():
+            hits = {phrases[c] for c in hit_phrase[bounds[i]:bounds[i + 1]].tolist()}
+            results[i] = (total_score[i].item(),
+                          labels[intent_index[i]] if intent_index[i] >= 0 else "General discussion",
+                          self._keywords_in(hits))
+        return results
+    
+    def score_batch(self, submissions: List[Dict], subreddit_names: Optional[List[str]] = None,
+                    now: Optional[float] = None, threshold: Optional[int] = None) -> List[Optional[tuple]]:
+        """Score many submission payloads at once with one shared ``now``.
+        
+        Gives exactly the tuples _calculate_relevance_score would for the same
+        ``now``; the component scores, weighted sum and threshold cut run on
+        NumPy arrays over the whole batch.
+        """
+        features = self.batch_features(submissions, subreddit_names)
+        return self.score_features(features, now=now, threshold=threshold)
+    
     def _assess_risks(self, subreddit: str, text: str) -> List[str]:
         """Identify risk flags for the opportunity."""
         risks = []
@@ -235,12 +1178,8 @@ class RedditLeadFinder:
         
         return variants
     
-    def search_reddit(self, date_range_days: int = 7, limit: int = 25) -> List[Dict]:
-        """Search Reddit for relevant opportunities."""
-        results = []
-        cutoff_time = time.time() - (date_range_days * 86400)
-        
-        # Determine subreddits to search
+    def _subreddits_to_search(self) -> List[str]:
+        """Resolve the subreddit list from the allowlist/blocklist config."""
         allowlist = self.config.get('allowlist_subs', [])
         blocklist = self.config.get('blocklist_subs', [])
         
@@ -254,121 +1193,1264 @@ class RedditLeadFinder:
             ]
         
         # Filter out blocklist
-        subreddits_to_search = [s for s in subreddits_to_search if s not in blocklist]
+        return [s for s in subreddits_to_search if s not in blocklist]
+    
+    def _worker_reddit(self) -> 'praw.Reddit':
+        """Return a Reddit client owned by the calling worker thread.
+        
+        PRAW instances are not thread-safe, so each search worker gets its own.
+        """
+        reddit = getattr(self._thread_local, 'reddit', None)
+        if reddit is None:
+            reddit = self._build_reddit()
+            self._thread_local.reddit = reddit
+        return reddit
+    
+    def _plan_queries(self, subreddits: List[str], keywords: List[str],
+                      date_range_days: Optional[int] = None, max_length: Optional[int] = None,
+                      result_limit: Optional[int] = None) -> List[Dict]:
+        """Pack subreddits and keywords into as few combined searches as possible.
+        
+        Subreddits are joined into an ``a+b+c`` multireddit and keywords into an
+        OR query. Each pack keeps the old depth of 10 results per subreddit/keyword
+        pair inside one result page, and the query string under Reddit's length cap.
+        Every plan carries the search time filter covering ``date_range_days``.
+        The range and the two caps default to this config's settings.
+        """
+        per_pair = 10
+        max_length = max_length or self.config.get('query_max_length', 512)
+        result_limit = result_limit or self.config.get('query_result_limit', 100)
+        max_pairs = max(1, result_limit // per_pair)
+        time_filter = self._time_filter(date_range_days)
         
-        # Search each subreddit
-        for subreddit_name in subreddits_to_search:
+        if not subreddits or not keywords:
+            return []
+        
+        # Pick the subreddit group size that needs the fewest searches overall
+        best = None
+        for sub_size in range(1, min(len(subreddits), max_pairs) + 1):
+            kw_size = max(1, max_pairs // sub_size)
+            count = -(-len(subreddits) // sub_size) * -(-len(keywords) // kw_size)
+            if best is None or count < best[0]:
+                best = (count, sub_size, kw_size)
+        _, sub_size, kw_size = best
+        
+        # Group keywords greedily, respecting both the pair budget and query length
+        keyword_groups = []
+        group = []
+        for keyword in keywords:
+            candidate = group + [keyword]
+            if group and (len(candidate) > kw_size or len(self._build_query(candidate)) > max_length):
+                keyword_groups.append(group)
+                candidate = [keyword]
+            group = candidate
+        if group:
+            keyword_groups.append(group)
+        
+        plans = []
+        for i in range(0, len(subreddits), sub_size):
+            sub_group = subreddits[i:i + sub_size]
+            for kw_group in keyword_groups:
+                plans.append({
+                    'subreddits': sub_group,
+                    'keywords': kw_group,
+                    'query': self._build_query(kw_group),
+                    'time_filter': time_filter,
+                    'limit': min(result_limit, per_pair * len(sub_group) * len(kw_group)),
+                })
+        return plans
+    
+    @staticmethod
+    def _build_query(keywords: List[str]) -> str:
+        """Combine keywords into one Reddit search query."""
+        if len(keywords) == 1:
+            return keywords[0]
+        return " OR ".join(f"({keyword})" for keyword in keywords)
+    
+    @staticmethod
+    def _subreddit_name_for(subreddits: List[str], submission: Dict) -> str:
+        """Map a submission from a multireddit listing back to our subreddit name."""
+        if len(subreddits) == 1:
+            return subreddits[0]
+        display_name = submission['subreddit'].lower()
+        for name in subreddits:
+            if name.lower() == display_name:
+                return name
+        return submission['subreddit']
+    
+    def _attribute_submission(self, plan: Dict, submission: Dict) -> tuple:
+        """Map a submission from a combined search back to its subreddit and keywords."""
+        subreddit_name = self._subreddit_name_for(plan['subreddits'], submission)
+        
+        matched = self._literal_keywords(plan['keywords'], submission)
+        
+        # Reddit's search also stems and matches fields we don't see; credit the whole pack
+        return subreddit_name, matched or list(plan['keywords'])
+    
+    @staticmethod
+    def _literal_keywords(keywords: List[str], submission: Dict) -> List[str]:
+        """Return the keywords whose terms all occur in a payload's title or body."""
+        text_lower = (submission['title'] + " " + submission['selftext']).lower()
+        return [kw for kw in keywords if all(term in text_lower for term in kw.lower().split())]
+    
+    def _run_search(self, plan: Dict) -> List:
+        """Run one planned search behind the per-subreddit circuit breakers.
+        
+        Subreddits whose breaker is open are left out of the multireddit. If
+        a combined search still fails after the transport's retries, each
+        subreddit is searched on its own so one broken subreddit doesn't
+        lose the whole slice, and failures are charged to the right breaker.
+        Rate limiting (429) is account-wide, so it is re-raised as is: no
+        split, and no breaker is charged.
+        """
+        subreddits = [name for name in plan['subreddits'] if self.circuit_breaker.allow(name)]
+        for name in plan['subreddits']:
+            if name not in subreddits:
+                self.metrics.incr('circuit_open', subreddit=name)
+        if not subreddits:
+            return []
+        if len(subreddits) < len(plan['subreddits']):
+            plan = {**plan, 'subreddits': subreddits,
+                    'limit': max(1, plan['limit'] * len(subreddits) // len(plan['subreddits']))}
+        
+        try:
+            submissions = self._search_plan(plan)
+        except Exception as e:
+            if self._is_rate_limited(e):
+                raise
+            if len(subreddits) == 1:
+                self.circuit_breaker.record_failure(subreddits[0])
+                raise
+            return self._search_each(plan)
+        for name in subreddits:
+            self.circuit_breaker.record_success(name)
+        return submissions
+    
+    def _search_each(self, plan: Dict) -> List:
+        """Fall back to one search per subreddit after a combined search failed."""
+        submissions = []
+        limit = max(1, plan['limit'] // len(plan['subreddits']))
+        for name in plan['subreddits']:
             try:
-                subreddit = self.reddit.subreddit(subreddit_name)
-                
-                # Search with top keywords
-                for keyword in self.keywords[:10]:  # Use top 10 keywords
-                    try:
-                        for submission in subreddit.search(keyword, time_filter='week', limit=10):
-                            if submission.created_utc < cutoff_time:
-                                continue
-                            
-                            # Check minimum requirements
-                            if submission.score < 3:
-                                continue
-                            
-                            # Calculate relevance
-                            score, intent, matched = self._calculate_relevance_score(
-                                submission.selftext,
-                                submission.title,
-                                subreddit_name,
-                                submission.created_utc,
-                                submission.score
-                            )
-                            
-                            # Filter by minimum score
-                            if score < 60:
-                                continue
-                            
-                            # Assess risks
-                            risks = self._assess_risks(subreddit_name, 
-                                                      submission.title + " " + submission.selftext)
-                            
-                            # Skip if hard risk flags
-                            hard_risks = ["vendor-banned", "low-quality thread"]
-                            if any(r in risks for r in hard_risks):
-                                continue
-                            
-                            # Determine if we should include link
-                            include_link = "self-promo restricted" not in risks
-                            
-                            # Generate reply drafts
-                            reply_drafts = self._generate_reply_drafts(
-                                submission.selftext[:500],
-                                intent,
-                                include_link
-                            )
-                            
-                            # Create result entry
-                            result = {
-                                'url': f"https://reddit.com{submission.permalink}",
-                                'type': 'post',
-                                'subreddit': f"r/{subreddit_name}",
-                                'title': submission.title,
-                                'author': f"u/{submission.author.name if submission.author else '[deleted]'}",
-                                'created_utc': datetime.fromtimestamp(submission.created_utc).isoformat(),
-                                'upvotes': submission.score,
-                                'matched_keywords': matched[:5],
-                                'intent_label': intent,
-                                'relevance_score': score,
-                                'fit_reasons': [
-                                    f"Strong {intent.lower()} intent signal",
-                                    f"Matched {len(matched)} relevant keywords",
-                                    f"Posted {int((time.time() - submission.created_utc) / 86400)} days ago"
-                                ],
-                                'risk_flags': risks,
-                                'reply_drafts': reply_drafts,
-                                'reply_notes': f"Natural entry point with {intent.lower()} context. " + 
-                                             ("Link included as value-add." if include_link else "No link due to sub rules; value-only approach."),
-                                'include_link': include_link
-                            }
-                            
-                            results.append(result)
-                            
-                    except Exception as e:
-                        print(f"Error searching keyword '{keyword}' in r/{subreddit_name}: {e}")
-                        continue
-                        
+                submissions.extend(self._search_plan({**plan, 'subreddits': [name], 'limit': limit}))
             except Exception as e:
-                print(f"Error accessing r/{subreddit_name}: {e}")
+                if self._is_rate_limited(e):
+                    raise
+                self.circuit_breaker.record_failure(name)
+                print(f"Error searching '{plan['query']}' in r/{name}: {e}")
+                self._record_error('search', e, subreddit=name)
+                continue
+            self.circuit_breaker.record_success(name)
+        return submissions
+    
+    def _search_plan(self, plan: Dict) -> List:
+        """Run one planned search and materialize its results.
+        
+        With the cache enabled, fresh search results are served locally and
+        only stale submission scores are refreshed from the API. In offline
+        mode whatever is cached is used and the network is never touched.
+        """
+        time_filter = plan['time_filter']
+        if self.cache is None:
+            return self._search_live(plan, time_filter)
+        
+        key = SubmissionCache.search_key(plan['subreddits'], plan['query'], time_filter, plan['limit'])
+        ids = self.cache.get_search(key, allow_stale=self.offline)
+        self.metrics.incr('cache_misses' if ids is None else 'cache_hits')
+        if ids is None:
+            if self.offline:
+                return []
+            submissions = self._search_live(plan, time_filter)
+            self.cache.put_search(key, submissions)
+            return submissions
+        
+        payloads, stale = self.cache.get_submissions(ids)
+        if stale and not self.offline:
+            updates = self._fetch_volatile(stale)
+            self.cache.refresh_volatile(updates)
+            for payload in payloads:
+                payload.update(updates.get(payload['id'], {}))
+        return payloads
+    
+    def _time_filter(self, date_range_days: Optional[int] = None) -> str:
+        """Smallest Reddit search time filter that covers date_range_days."""
+        date_range_days = date_range_days or self.date_range_days
+        for days, time_filter in ((1, 'day'), (7, 'week'), (30, 'month'), (365, 'year')):
+            if date_range_days <= days:
+                return time_filter
+        return 'all'
+    
+    def _search_live(self, plan: Dict, time_filter: str) -> List:
+        """Run a planned search against the Reddit API."""
+        self.rate_limiter.acquire()
+        multireddit = "+".join(plan['subreddits'])
+        self.metrics.incr('api_calls', endpoint='search', subreddit=multireddit)
+        for keyword in plan['keywords']:
+            self.metrics.incr('keyword_searches', keyword=keyword)
+        with self.metrics.timer('fetch'):
+            subreddit = self._worker_reddit().subreddit(multireddit)
+            listing = list(subreddit.search(plan['query'], time_filter=time_filter, limit=plan['limit']))
+        return self._hydrate(listing)
+    
+    # Fields read from a submission's raw data; missing ones mean a lazy object
+    PAYLOAD_FIELDS = ('id', 'title', 'selftext', 'score', 'num_comments',
+                      'created_utc', 'permalink', 'author', 'subreddit')
+    
+    @staticmethod
+    def _raw_name(value) -> Optional[str]:
+        """Read a Redditor/Subreddit name without triggering a PRAW fetch."""
+        if value is None or isinstance(value, str):
+            return value
+        raw = vars(value)
+        return raw.get('name') or raw.get('display_name')
+    
+    def _local_payload(self, submission) -> Optional[Dict]:
+        """Build a payload from data PRAW already holds, or None if it would fetch.
+        
+        Reading attributes through vars() bypasses PRAW's lazy loading, so a
+        missing field never turns into a per-object request.
+        """
+        raw = vars(submission)
+        if any(field not in raw for field in self.PAYLOAD_FIELDS):
+            return None
+        return {
+            'id': raw['id'],
+            'fullname': f"t3_{raw['id']}",
+            'title': raw['title'],
+            'selftext': raw['selftext'],
+            'score': raw['score'],
+            'num_comments': raw['num_comments'],
+            'created_utc': raw['created_utc'],
+            'permalink': raw['permalink'],
+            'author': self._raw_name(raw['author']),
+            'subreddit': self._raw_name(raw['subreddit']),
+        }
+    
+    def _hydrate(self, submissions: List) -> List[Dict]:
+        """Convert submissions to local payloads, bulk-fetching any lazy ones.
+        
+        Listing results normally carry every field already; objects that don't
+        are fetched 100 at a time with reddit.info() instead of one by one.
+        """
+        payloads = [self._local_payload(s) for s in submissions]
+        missing = [f"t3_{vars(s)['id']}" for s, p in zip(submissions, payloads) if p is None]
+        if not missing:
+            return payloads
+        
+        hydrated = {}
+        for i in range(0, len(missing), 100):
+            self.rate_limiter.acquire()
+            self.metrics.incr('api_calls', endpoint='info')
+            with self.metrics.timer('fetch'):
+                for submission in self._worker_reddit().info(fullnames=missing[i:i + 100]):
+                    payload = self._local_payload(submission)
+                    if payload:
+                        hydrated[payload['id']] = payload
+        self.metrics.incr('hydrated', len(hydrated))
+        
+        return [p if p is not None else hydrated.get(vars(s)['id'])
+                for s, p in zip(submissions, payloads)
+                if p is not None or vars(s)['id'] in hydrated]
+    
+    def _fetch_volatile(self, ids: List[str]) -> Dict[str, Dict]:
+        """Fetch current volatile fields for submissions, 100 per request."""
+        updates = {}
+        for i in range(0, len(ids), 100):
+            self.rate_limiter.acquire()
+            self.metrics.incr('api_calls', endpoint='info')
+            fullnames = [f"t3_{submission_id}" for submission_id in ids[i:i + 100]]
+            with self.metrics.timer('fetch'):
+                for submission in self._worker_reddit().info(fullnames=fullnames):
+                    raw = vars(submission)
+                    updates[raw['id']] = {field: raw[field] for field in SubmissionCache.VOLATILE_FIELDS
+                                          if field in raw}
+        return updates
+    
+    def _fetch_searches(self, plans: List[Dict]):
+        """Fan planned searches out over a bounded worker pool.
+        
+        Yields (plan, submissions) in plan order so the merged output does
+        not depend on which request finishes first.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._run_search, plan) for plan in plans]
+            for plan, future in zip(plans, futures):
+                try:
+                    submissions = future.result()
+                except Exception as e:
+                    print(f"Error searching '{plan['query']}' in r/{'+'.join(plan['subreddits'])}: {e}")
+                    self._record_error('search', e, subreddit="+".join(plan['subreddits']))
+                    continue
+                yield plan, submissions
+    
+    def _process_submission(self, submission: Dict, subreddit_name: str,
+                            cutoff_time: float, with_drafts: bool = True,
+                            scored: Optional[tuple] = None) -> Optional[Dict]:
+        """Score, risk-check and draft replies for one submission.
+        
+        With ``with_drafts=False`` the 'reply_drafts' slot is left as None for
+        _add_reply_drafts to fill once the lead is known to make the cut.
+        """
+        if submission['created_utc'] < cutoff_time:
+            self.metrics.incr('filtered', reason='age')
+            return None
+        
+        # Check minimum requirements
+        if submission['score'] < self.min_upvotes:
+            self.metrics.incr('filtered', reason='upvotes')
+            return None
+        
+        # Skip threads, subreddits and authors we can't reply to right now
+        blocked = self._reply_blocked(submission)
+        if blocked:
+            self.metrics.incr('filtered', reason=blocked)
+            return None
+        
+        # Calculate relevance (unless the caller already batch-scored it)
+        if scored is None:
+            with self.metrics.timer('score'):
+                scored = self._calculate_relevance_score(
+                    submission['selftext'],
+                    submission['title'],
+                    subreddit_name,
+                    submission['created_utc'],
+                    submission['score']
+                )
+        score, intent, matched = scored
+        
+        # Filter by minimum score
+        if score < self.relevance_threshold:
+            self.metrics.incr('filtered', reason='score')
+            return None
+        
+        # Assess risks
+        with self.metrics.timer('risk'):
+            risks = self._assess_risks(subreddit_name, 
+                                      submission['title'] + " " + submission['selftext'])
+        
+        # Skip if hard risk flags
+        hard_risks = ["vendor-banned", "low-quality thread"]
+        if any(r in risks for r in hard_risks):
+            self.metrics.incr('filtered', reason='risk')
+            return None
+        
+        # Determine if we should include link
+        include_link = "self-promo restricted" not in risks
+        
+        # Create result entry
+        with self.metrics.timer('build'):
+            result = {
+                'url': f"https://reddit.com{submission['permalink']}",
+                'type': submission.get('type', 'post'),
+                'subreddit': f"r/{subreddit_name}",
+                'title': submission.get('thread_title', submission['title']),
+                'author': f"u/{submission['author'] or '[deleted]'}",
+                'created_utc': datetime.fromtimestamp(submission['created_utc']).isoformat(),
+                'upvotes': submission['score'],
+                'matched_keywords': matched[:5],
+                'intent_label': intent,
+                'relevance_score': score,
+                'fit_reasons': [
+                    f"Strong {intent.lower()} intent signal",
+                    f"Matched {len(matched)} relevant keywords",
+                    f"Posted {int((time.time() - submission['created_utc']) / 86400)} days ago"
+                ],
+                'risk_flags': risks,
+                'reply_drafts': None,
+                'reply_notes': f"Natural entry point with {intent.lower()} context. " + 
+                             ("Link included as value-add." if include_link else "No link due to sub rules; value-only approach."),
+                'include_link': include_link
+            }
+        
+        if with_drafts:
+            self._add_reply_drafts(result, submission['selftext'][:500])
+        return result
+    
+    def _replyable_subreddits(self, subreddits: List[str]) -> List[str]:
+        """Leave out subreddits whose daily reply cap is used up, before any API call."""
+        replyable = []
+        for name in subreddits:
+            if self.reply_history.subreddit_capped(name):
+                self.metrics.incr('filtered', reason='reply_subreddit')
+                print(f"⏭️  Skipping r/{name}: daily reply limit reached")
+            else:
+                replyable.append(name)
+        return replyable
+    
+    def _reply_blocked(self, submission: Dict) -> Optional[str]:
+        """Return the rate_limits rule that rules out replying to a submission, if any."""
+        return self.reply_history.blocked_reason(submission.get('thread_id', submission['id']),
+                                                 submission['subreddit'], submission['author'])
+    
+    @staticmethod
+    def _thread_from_url(url: str) -> tuple:
+        """Return (subreddit, thread id) from a Reddit thread URL."""
+        match = re.search(r'/r/([^/]+)/comments/([a-z0-9]+)', url, re.IGNORECASE)
+        if not match:
+            raise ValueError(f"Not a Reddit thread URL: {url}")
+        return match.group(1), match.group(2)
+    
+    @staticmethod
+    def _lead_author(author: Optional[str]) -> Optional[str]:
+        """Turn a lead's 'u/name' author back into a username (None if deleted)."""
+        if author and author.startswith('u/'):
+            author = author[2:]
+        return None if author == '[deleted]' else author
+    
+    def _lead_blocked(self, lead: Dict) -> Optional[str]:
+        """Return the rate_limits rule that rules out replying to a saved lead, if any."""
+        subreddit, thread_id = self._thread_from_url(lead['url'])
+        return self.reply_history.blocked_reason(thread_id, subreddit, self._lead_author(lead['author']))
+    
+    def record_reply(self, url: str, author: Optional[str] = None):
+        """Log a reply posted to the thread at url so rate_limits apply to it."""
+        subreddit, thread_id = self._thread_from_url(url)
+        self.reply_history.record(thread_id, subreddit, self._lead_author(author))
+    
+    @staticmethod
+    def _read_leads(leads_file: str) -> List[Dict]:
+        """Load saved leads from a JSON array (leads.json) or JSONL (--stream) file."""
+        opener = gzip.open if leads_file.endswith('.gz') else open
+        with opener(leads_file, 'rt') as f:
+            text = f.read()
+        try:
+            leads = json.loads(text)
+        except json.JSONDecodeError:
+            leads = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return leads if isinstance(leads, list) else [leads]
+    
+    def record_replies(self, urls: List[str], leads_file: str = 'leads.json'):
+        """Log replies to several threads or comments, taking each author from the saved leads."""
+        def path(url):
+            return re.sub(r'^https?://[^/]+', '', url).rstrip('/').lower()
+        
+        authors = {}
+        if os.path.exists(leads_file):
+            authors = {path(lead['url']): lead['author'] for lead in self._read_leads(leads_file)}
+        for url in urls:
+            self.record_reply(url, authors.get(path(url)))
+            print(f"📝 Recorded reply to {url}")
+    
+    def _add_reply_drafts(self, result: Dict, context: str):
+        """Generate reply drafts for a lead that is going to be emitted."""
+        with self.metrics.timer('draft'):
+            result['reply_drafts'] = self._generate_reply_drafts(
+                context,
+                result['intent_label'],
+                result['include_link']
+            )
+        self.metrics.incr('drafts_generated')
+    
+    def _score_candidates(self, candidates, cutoff_time: float, limit: int,
+                          scores: Optional[Dict[str, tuple]] = None,
+                          mine_comments: bool = False, drafts: bool = True) -> List[Dict]:
+        """Dedupe, score and rank (subreddit_name, keywords, submission) candidates.
+        
+        Qualified leads go to every sink in self.sinks as they are found; only
+        the top ``limit`` are held in memory for the returned ranking. Without
+        streaming sinks, reply drafts are generated only for that final top.
+        Every unique candidate is also written to self.candidate_log, if set,
+        so the run can be re-ranked offline. ``scores`` supplies precomputed
+        (batch) scores by fullname. With ``mine_comments`` the comment
+        threads of the best posts are scored into the same ranking. With
+        ``drafts=False`` no reply drafts are generated at all.
+        """
+        top = TopNSink(limit)
+        eager_drafts = bool(self.sinks) and drafts
+        
+        # Deduplicate by fullname as soon as a post is fetched, so each post is
+        # scored and drafted once no matter how many keywords found it (bare
+        # ids of posts and comments can collide)
+        self.found_by = {}
+        
+        for subreddit_name, keywords, submission in candidates:
+            self.metrics.incr('fetched', subreddit=subreddit_name)
+            for keyword in keywords:
+                self.metrics.incr('keyword_fetched', keyword=keyword)
+            
+            found_by = self.found_by.get(submission['fullname'])
+            if found_by is not None:
+                found_by.extend(kw for kw in keywords if kw not in found_by)
+                self.metrics.incr('duplicates_skipped', subreddit=subreddit_name)
                 continue
+            found_by = self.found_by[submission['fullname']] = list(keywords)
+            
+            if self.candidate_log:
+                self.candidate_log.write({'subreddit': subreddit_name,
+                                          'search_keywords': found_by,
+                                          'submission': submission})
+            
+            result = self._process_submission(submission, subreddit_name, cutoff_time,
+                                              with_drafts=eager_drafts,
+                                              scored=scores.get(submission['fullname']) if scores else None)
+            if result:
+                result['search_keywords'] = found_by
+                self.metrics.incr('qualified', subreddit=subreddit_name)
+                # Keywords credited only as part of a pack didn't prove they find leads
+                for keyword in self._literal_keywords(found_by, submission):
+                    self.metrics.incr('keyword_qualified', keyword=keyword)
+                top.write(result, None if eager_drafts else submission['selftext'][:500])
+                for sink in self.sinks:
+                    sink.write(result)
         
-        # Sort by relevance score and return top results
-        results.sort(key=lambda x: x['relevance_score'], reverse=True)
+        if mine_comments:
+            self._score_comments(top, cutoff_time, eager_drafts)
         
-        # Deduplicate by URL
-        seen_urls = set()
-        unique_results = []
-        for result in results:
-            if result['url'] not in seen_urls:
-                seen_urls.add(result['url'])
-                unique_results.append(result)
+        # Top results by relevance score, drafted now that they made the cut
+        ranked = top.ranked_items()
+        for result, context in ranked:
+            if result['reply_drafts'] is None and drafts:
+                self._add_reply_drafts(result, context)
+            self.metrics.incr('emitted', subreddit=result['subreddit'][2:])
+        return [result for result, _ in ranked]
+    
+    def _walk_comments(self, thread: Dict) -> List[Dict]:
+        """Read one thread's comments breadth-first within the configured budgets.
+        
+        At most ``replace_more_limit`` "load more comments" stubs are expanded,
+        one request each, and the walk stops at ``max_depth`` or after
+        ``max_comments_per_submission`` comments, so even a huge thread costs
+        a bounded number of API calls.
+        """
+        config = self.config.get('comments', {})
+        max_depth = config.get('max_depth', 3)
+        max_comments = config.get('max_comments_per_submission', 100)
+        from praw.models import MoreComments
+        subreddit_name, thread_id = self._thread_from_url(thread['url'])
+        
+        submission = self._worker_reddit().submission(id=thread_id)
+        submission.comment_sort = config.get('sort', 'top')
+        submission.comment_limit = max_comments
+        self.rate_limiter.acquire()
+        self.metrics.incr('api_calls', endpoint='comments', subreddit=subreddit_name)
+        with self.metrics.timer('fetch'):
+            forest = submission.comments
+            for _ in range(config.get('replace_more_limit', 2)):
+                if not any(isinstance(c, MoreComments) for c in forest.list()):
+                    break
+                self.rate_limiter.acquire()
+                self.metrics.incr('api_calls', endpoint='morechildren', subreddit=subreddit_name)
+                forest.replace_more(limit=1)
         
-        return unique_results[:limit]
+        comments = []
+        queue = deque((comment, 1) for comment in forest)
+        while queue and len(comments) < max_comments:
+            comment, depth = queue.popleft()
+            if isinstance(comment, MoreComments):
+                continue
+            raw = vars(comment)
+            if depth < max_depth:
+                queue.extend((reply, depth + 1) for reply in comment.replies)
+            if raw['body'] in ('[deleted]', '[removed]'):
+                continue
+            comments.append({
+                'type': 'comment',
+                'id': raw['id'],
+                'fullname': f"t1_{raw['id']}",
+                'thread_id': thread_id,
+                'thread_title': thread['title'],
+                'title': '',
+                'selftext': raw['body'],
+                'score': raw['score'],
+                'num_comments': 0,
+                'created_utc': raw['created_utc'],
+                'permalink': raw['permalink'],
+                'author': self._raw_name(raw['author']),
+                'subreddit': subreddit_name,
+            })
+        return comments
+    
+    def _score_comments(self, top: TopNSink, cutoff_time: float, eager_drafts: bool):
+        """Score comments from the best qualified threads into the running top N."""
+        config = self.config.get('comments', {})
+        if not config.get('enabled', False) or self.offline:
+            return
+        min_score = config.get('min_submission_score', 70)
+        threads = [lead for lead, _ in top.ranked_items()
+                   if lead['type'] == 'post' and lead['relevance_score'] >= min_score]
+        threads = threads[:config.get('max_submissions', 10)]
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._walk_comments, thread) for thread in threads]
+            for thread, future in zip(threads, futures):
+                subreddit_name = thread['subreddit'][2:]
+                try:
+                    comments = future.result()
+                except Exception as e:
+                    print(f"Error reading comments of {thread['url']}: {e}")
+                    self._record_error('comments', e, subreddit=subreddit_name)
+                    continue
+                
+                for comment in comments:
+                    self.metrics.incr('comments_scanned', subreddit=subreddit_name)
+                    keywords = self._keywords_in_post(comment)
+                    if self.candidate_log:
+                        self.candidate_log.write({'subreddit': subreddit_name,
+                                                  'search_keywords': keywords,
+                                                  'submission': comment})
+                    
+                    result = self._process_submission(comment, subreddit_name, cutoff_time,
+                                                      with_drafts=eager_drafts)
+                    if result:
+                        result['search_keywords'] = keywords
+                        self.metrics.incr('qualified', subreddit=subreddit_name)
+                        self.metrics.incr('comment_leads', subreddit=subreddit_name)
+                        top.write(result, None if eager_drafts else comment['selftext'][:500])
+                        for sink in self.sinks:
+                            sink.write(result)
+    
+    def _search_keywords(self) -> List[str]:
+        """Keywords to search this run, chosen by the scheduler if enabled."""
+        if self.keyword_scheduler:
+            return self.keyword_scheduler.select(self.keywords, self.search_keyword_limit)
+        return self.keywords[:self.search_keyword_limit]
     
-    def run(self, output_file: str = 'leads.json'):
-        """Run the lead finder and save results."""
+    def search_reddit(self, date_range_days: Optional[int] = None,
+                      limit: Optional[int] = None) -> List[Dict]:
+        """Search Reddit for relevant opportunities."""
+        self.metrics = RunMetrics()
+        date_range_days = date_range_days or self.date_range_days
+        limit = limit or self.max_results
+        cutoff_time = time.time() - (date_range_days * 86400)
+        
+        subreddits_to_search = self._replyable_subreddits(self._subreddits_to_search())
+        
+        # Search all subreddits with this run's keywords, packed into combined queries
+        plans = self._plan_queries(subreddits_to_search, self._search_keywords(), date_range_days)
+        
+        def candidates():
+            for plan, submissions in self._fetch_searches(plans):
+                for submission in submissions:
+                    subreddit_name, keywords = self._attribute_submission(plan, submission)
+                    yield subreddit_name, keywords, submission
+        
+        results = self._score_candidates(candidates(), cutoff_time, limit, mine_comments=True)
+        self._record_keyword_yield(plans)
+        return results
+    
+    def _record_keyword_yield(self, plans: List[Dict]):
+        """Feed this run's live searches and per-keyword leads to the keyword scheduler.
+        
+        Staged runs report their half each: fetch the searches (with its
+        plans), and credit_fetch the leads of the first score or rerank.
+        """
+        if self.keyword_scheduler:
+            self.keyword_scheduler.record(plans, self.metrics.by_label('keyword_qualified', 'keyword'),
+                                          self.metrics.by_label('keyword_searches', 'keyword'))
+            self.keyword_scheduler.save()
+    
+    def _load_watermarks(self) -> Dict[str, Dict]:
+        """Load the per-subreddit high-water marks from the last incremental run."""
+        path = self.config.get('incremental', {}).get('state_path', '.cache/watermarks.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+    
+    def _save_watermarks(self, watermarks: Dict[str, Dict]):
+        path = self.config.get('incremental', {}).get('state_path', '.cache/watermarks.json')
+        _ensure_parent_dir(path)
+        with open(path, 'w') as f:
+            json.dump(watermarks, f, indent=2)
+    
+    def _run_new(self, subreddit_name: str, mark: Optional[Dict], cutoff_time: float) -> List:
+        """Page through r/<name>/new, newest first, until the watermark is reached."""
+        if not self.circuit_breaker.allow(subreddit_name):
+            self.metrics.incr('circuit_open', subreddit=subreddit_name)
+            raise RuntimeError("circuit open after repeated failures")
+        max_new = self.config.get('incremental', {}).get('max_new_per_subreddit', 1000)
+        subreddit = self._worker_reddit().subreddit(subreddit_name)
+        submissions = []
+        try:
+            # Fetch one 100-post page per call so every request takes a token first
+            after = None
+            read = 0
+            done = False
+            while not done and read < max_new:
+                page_size = min(100, max_new - read)
+                self.rate_limiter.acquire()
+                self.metrics.incr('api_calls', endpoint='new', subreddit=subreddit_name)
+                with self.metrics.timer('fetch'):
+                    page = list(subreddit.new(limit=page_size,
+                                              params={'after': after} if after else {}))
+                read += len(page)
+                for submission in page:
+                    raw = vars(submission)
+                    if mark and (f"t3_{raw['id']}" == mark['fullname']
+                                 or raw['created_utc'] < mark['created_utc']):
+                        done = True
+                        break
+                    if raw['created_utc'] < cutoff_time:
+                        done = True
+                        break
+                    submissions.append(submission)
+                if len(page) < page_size:
+                    done = True
+                    break
+                after = f"t3_{vars(page[-1])['id']}"
+            if mark and not done:
+                # The watermark moves to the newest post, so whatever lies
+                # between the cap and the old mark is never read
+                self.metrics.incr('new_gap', subreddit=subreddit_name)
+                print(f"⚠️  r/{subreddit_name}: stopped at max_new_per_subreddit={max_new} before "
+                      f"reaching the last run's posts; older new posts were skipped")
+            payloads = self._hydrate(submissions)
+        except Exception as e:
+            if not self._is_rate_limited(e):
+                self.circuit_breaker.record_failure(subreddit_name)
+            raise
+        self.circuit_breaker.record_success(subreddit_name)
+        return payloads
+    
+    def search_new(self, date_range_days: Optional[int] = None,
+                   limit: Optional[int] = None) -> List[Dict]:
+        """Score only posts newer than each subreddit's stored watermark.
+        
+        Subreddits without a watermark are read back to the date range cutoff.
+        Watermarks are advanced only for subreddits that were read successfully.
+        """
+        self.metrics = RunMetrics()
+        date_range_days = date_range_days or self.date_range_days
+        limit = limit or self.max_results
+        cutoff_time = time.time() - (date_range_days * 86400)
+        subreddits_to_search = self._replyable_subreddits(self._subreddits_to_search())
+        watermarks = self._load_watermarks()
+        fetched = {}
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._run_new, name, watermarks.get(name), cutoff_time)
+                       for name in subreddits_to_search]
+            for subreddit_name, future in zip(subreddits_to_search, futures):
+                try:
+                    fetched[subreddit_name] = future.result()
+                except Exception as e:
+                    print(f"Error reading new posts in r/{subreddit_name}: {e}")
+                    self._record_error('new', e, subreddit=subreddit_name)
+        
+        def candidates():
+            for subreddit_name, submissions in fetched.items():
+                for submission in submissions:
+                    yield subreddit_name, self._keywords_in_post(submission), submission
+        
+        results = self._score_candidates(candidates(), cutoff_time, limit, mine_comments=True)
+        
+        for subreddit_name, submissions in fetched.items():
+            if submissions:
+                newest = submissions[0]
+                watermarks[subreddit_name] = {
+                    'fullname': newest['fullname'],
+                    'created_utc': newest['created_utc'],
+                }
+        self._save_watermarks(watermarks)
+        
+        self.metrics.incr('new_submissions', sum(len(s) for s in fetched.values()))
+        return results
+    
+    def _merge_leads(self, output_file: str, results: List[Dict]) -> List[Dict]:
+        """Merge new leads into the existing leads store.
+        
+        Existing leads are dropped once they expire or once the reply history
+        rules them out (e.g. after --record-reply for that thread).
+        """
+        existing = []
+        if os.path.exists(output_file):
+            with open(output_file, 'r') as f:
+                existing = json.load(f)
+        
+        cutoff = datetime.now() - timedelta(days=self.date_range_days)
+        merged = {}
+        for lead in existing:
+            if datetime.fromisoformat(lead['created_utc']) < cutoff:
+                continue
+            blocked = self._lead_blocked(lead)
+            if blocked:
+                self.metrics.incr('filtered', reason=blocked)
+                continue
+            merged[lead['url']] = lead
+        merged.update((lead['url'], lead) for lead in results)
+        
+        return sorted(merged.values(), key=lambda x: x['relevance_score'], reverse=True)
+    
+    def _candidates_path(self) -> str:
+        return self.config.get('rerank', {}).get('candidates_path', '.cache/candidates.jsonl')
+    
+    def _read_candidates(self, candidates_path: Optional[str] = None) -> List[Dict]:
+        """Load a candidate file written by run, fetch or the multi-config runner."""
+        path = candidates_path or self._candidates_path()
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def _write_candidates(self, rows, candidates_path: Optional[str] = None):
+        path = candidates_path or self._candidates_path()
+        _ensure_parent_dir(path)
+        sink = JSONLSink(path, compact=True, append=False)
+        for row in rows:
+            sink.write(row)
+        sink.close()
+    
+    def _candidate_features(self, rows: List[Dict], candidates_path: Optional[str] = None) -> Dict:
+        """batch_features for a candidate file, cached in a sidecar next to it.
+        
+        The sidecar (``<candidates>.features.npz``) is reused while the file and
+        the matchers are unchanged, so re-ranking with new weights or
+        thresholds only runs score_features.
+        """
+        import numpy as np
+        path = candidates_path or self._candidates_path()
+        sidecar = path + '.features.npz'
+        stat = os.stat(path)
+        signature = json.dumps([stat.st_size, stat.st_mtime_ns, self.phrase_matcher.phrases,
+                                self.INTENT_PATTERNS, self.QUALITY_SUBS])
+        try:
+            with np.load(sidecar) as cached:
+                if cached['signature'].item() == signature:
+                    return {key: cached[key] for key in cached.files if key != 'signature'}
+        except (OSError, KeyError, ValueError):
+            pass
+        
+        features = self.batch_features([row['submission'] for row in rows],
+                                       [row['subreddit'] for row in rows])
+        try:
+            with open(sidecar, 'wb') as f:
+                np.savez(f, signature=np.array(signature), **features)
+        except OSError as e:
+            print(f"Warning: could not cache scoring features: {e}")
+        return features
+    
+    @staticmethod
+    def _add_candidate(rows: Dict, subreddit_name: str, keywords: List[str], submission: Dict):
+        """Add a fetched submission to rows by fullname, merging the keywords that found it."""
+        row = rows.get(submission['fullname'])
+        if row is None:
+            rows[submission['fullname']] = {'subreddit': subreddit_name,
+                                      'search_keywords': list(keywords),
+                                      'submission': submission}
+        else:
+            row['search_keywords'].extend(kw for kw in keywords if kw not in row['search_keywords'])
+    
+    def fetch(self, candidates_path: Optional[str] = None) -> int:
+        """Fetch this run's search results into a candidate file, without scoring.
+        
+        The file has the rerank log format, so score, draft and rerank can
+        finish the run offline. A ``<candidates>.fetch.json`` marker ties the
+        file to this fetch so its leads are credited to the keyword scheduler
+        only once (see credit_fetch). Returns the number of unique candidates.
+        """
+        self.metrics = RunMetrics()
+        plans = self._plan_queries(self._replyable_subreddits(self._subreddits_to_search()),
+                                   self._search_keywords())
+        rows = OrderedDict()
+        for plan, submissions in self._fetch_searches(plans):
+            for submission in submissions:
+                self._add_candidate(rows, *self._attribute_submission(plan, submission), submission)
+        self._write_candidates(rows.values(), candidates_path)
+        self._record_keyword_yield(plans)
+        self._write_fetch_marker(candidates_path or self._candidates_path(),
+                                 {'fetch_id': os.urandom(8).hex(), 'credited': False})
+        return len(rows)
+    
+    @staticmethod
+    def _candidates_signature(path: str) -> List[int]:
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    
+    def _write_fetch_marker(self, path: str, marker: Dict):
+        marker = {**marker, 'candidates': self._candidates_signature(path)}
+        with open(path + '.fetch.json', 'w') as f:
+            json.dump(marker, f)
+    
+    def credit_fetch(self, candidates_path: Optional[str] = None) -> bool:
+        """Credit the last score/rerank's leads per keyword to the scheduler, once per fetch.
+        
+        Only candidate files written by fetch and not credited yet count, so
+        re-scoring the same file while tuning never inflates keyword yield.
+        """
+        path = candidates_path or self._candidates_path()
+        try:
+            with open(path + '.fetch.json', 'r') as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if marker.get('credited') or marker.get('candidates') != self._candidates_signature(path):
+            return False
+        self._record_keyword_yield([])
+        self._write_fetch_marker(path, {**marker, 'credited': True})
+        return True
+    
+    def draft(self, leads_file: str = 'leads.json',
+              candidates_path: Optional[str] = None) -> List[Dict]:
+        """Add reply drafts to saved leads that don't have them yet.
+        
+        Post text for context is taken from the candidate file when present.
+        """
+        self.metrics = RunMetrics()
+        with open(leads_file, 'r') as f:
+            leads = json.load(f)
+        
+        contexts = {}
+        if os.path.exists(candidates_path or self._candidates_path()):
+            contexts = {f"https://reddit.com{row['submission']['permalink']}": row['submission']['selftext'][:500]
+                        for row in self._read_candidates(candidates_path)}
+        for lead in leads:
+            if lead.get('reply_drafts') is None:
+                self._add_reply_drafts(lead, contexts.get(lead['url'], ''))
+        return leads
+    
+    def rerank(self, candidates_path: Optional[str] = None,
+               limit: Optional[int] = None, drafts: bool = True) -> List[Dict]:
+        """Re-rank a stored candidate set with the current weights and thresholds.
+        
+        Reads the raw posts logged by a previous run, batch-scores them (text
+        features are cached next to the candidate file) and runs the usual
+        filters, ranking and (unless ``drafts=False``) drafting. No API calls
+        are made.
+        """
+        self.metrics = RunMetrics()
+        rows = self._read_candidates(candidates_path)
+        features = self._candidate_features(rows, candidates_path)
+        
+        # Threads we can't reply to are left unscored; posts below the
+        # threshold are dropped here rather than rescored one by one
+        eligible = [not self._reply_blocked(row['submission']) for row in rows]
+        scored = self.score_features(features, threshold=self.relevance_threshold, mask=eligible)
+        scores = {}
+        candidates = []
+        for row, is_eligible, result in zip(rows, eligible, scored):
+            if is_eligible and result is None:
+                self.metrics.incr('filtered', reason='score')
+                continue
+            if result is not None:
+                scores[row['submission']['fullname']] = result
+            candidates.append((row['subreddit'], row['search_keywords'], row['submission']))
+        
+        cutoff_time = time.time() - (self.date_range_days * 86400)
+        return self._score_candidates(candidates, cutoff_time, limit or self.max_results,
+                                      scores=scores, drafts=drafts)
+    
+    def stream(self, output_file: str = 'leads.jsonl', callback=None,
+               reconnect_delay: float = 30):
+        """Score new posts as they are submitted and emit qualified leads at once.
+        
+        Each lead is appended to output_file as one JSON line (and passed to
+        callback, if given) as soon as it qualifies. Runs until interrupted,
+        reconnecting after API errors. All subreddits share one stream, so
+        reply limits are checked per post against the live reply history
+        rather than by dropping subreddits when the stream starts.
+        """
+        subreddits = self._subreddits_to_search()
+        multireddit = "+".join(subreddits)
+        seen = OrderedDict()  # Bounded; only has to cover stream reconnect overlap
+        skip_existing = True
+        
+        print(f"📡 Streaming new posts from r/{multireddit}...")
+        
+        sink = self._open_stream_sink(output_file)
+        try:
+            while True:
+                try:
+                    stream = self.reddit.subreddit(multireddit).stream.submissions(
+                        skip_existing=skip_existing)
+                    skip_existing = False  # After a reconnect, catch up on what we missed
+                    for item in stream:
+                        submission_id = vars(item)['id']
+                        if submission_id in seen:
+                            continue
+                        seen[submission_id] = True
+                        if len(seen) > 10000:
+                            seen.popitem(last=False)
+                        
+                        hydrated = self._hydrate([item])
+                        if not hydrated:
+                            continue
+                        submission = hydrated[0]
+                        subreddit_name = self._subreddit_name_for(subreddits, submission)
+                        keywords = self._keywords_in_post(submission)
+                        cutoff_time = time.time() - (self.date_range_days * 86400)
+                        
+                        result = self._process_submission(submission, subreddit_name, cutoff_time)
+                        if not result:
+                            continue
+                        result['search_keywords'] = keywords
+                        
+                        sink.write(result)
+                        if callback:
+                            callback(result)
+                        print(f"🎯 {result['relevance_score']} {result['subreddit']}: {result['title']}")
+                except KeyboardInterrupt:
+                    print("\n👋 Stream stopped")
+                    return
+                except Exception as e:
+                    print(f"Stream error: {e}; reconnecting in {reconnect_delay}s")
+                    self._record_error('stream', e)
+                    time.sleep(reconnect_delay)
+        finally:
+            sink.close()
+    
+    def _save_results(self, output_file: str, results: List[Dict]):
+        """Save the ranked view to JSON."""
+        compact = self.config.get('output', {}).get('compact', False)
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=None if compact else 2)
+        
+        print(f"💾 Results saved to {output_file}")
+    
+    def run(self, output_file: str = 'leads.json', report_path: Optional[str] = None,
+            prometheus_path: Optional[str] = None):
+        """Run the lead finder and save results (plus optional metrics reports)."""
         print("🔍 Starting Reddit Lead Finder for TradingWizard.ai...")
         print(f"📊 Searching with {len(self.keywords)} keywords...")
         
-        results = self.search_reddit()
+        # Optionally stream every qualified lead to JSONL while the run is going
+        stream_path = self.config.get('output', {}).get('jsonl_path')
+        if stream_path:
+            self.sinks.append(self._open_stream_sink(stream_path))
+        
+        if self.config.get('rerank', {}).get('save_candidates', True):
+            candidates_path = self._candidates_path()
+            _ensure_parent_dir(candidates_path)
+            self.candidate_log = JSONLSink(candidates_path, compact=True, append=False)
+        
+        incremental = self.config.get('incremental', {}).get('enabled', False)
+        try:
+            if incremental:
+                results = self.search_new()
+                print(f"🆕 Read {self.stats['new_submissions']} posts newer than the last run")
+            else:
+                results = self.search_reddit()
+        finally:
+            for sink in self.sinks:
+                sink.close()
+            self.sinks = []
+            if self.candidate_log:
+                self.candidate_log.close()
+                self.candidate_log = None
         
         print(f"✅ Found {len(results)} qualified opportunities")
+        print(f"♻️  Skipped {self.stats['duplicates_skipped']} duplicate submissions before scoring")
+        print(f"✍️  Drafted replies for {self.stats['drafts_generated']} leads")
         
-        # Save to JSON
-        with open(output_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        if incremental:
+            results = self._merge_leads(output_file, results)
         
-        print(f"💾 Results saved to {output_file}")
+        self._save_results(output_file, results)
+        
+        metrics_config = self.config.get('metrics', {})
+        report_path = report_path or metrics_config.get('report_path')
+        prometheus_path = prometheus_path or metrics_config.get('prometheus_path')
+        if report_path or prometheus_path:
+            self.metrics.save(report_path, prometheus_path)
+            print(f"📈 Metrics saved to {', '.join(p for p in (report_path, prometheus_path) if p)}")
         
         return results
 
 
+def _score_shard(config_path: str, candidates_path: str, output_file: str) -> tuple:
+    """Process-pool worker: rank one config's share of the fetched candidates.
+    
+    Returns the lead count and the leads per keyword, for the parent to
+    feed to that config's keyword scheduler.
+    """
+    finder = RedditLeadFinder(config_path)
+    results = finder.rerank(candidates_path)
+    finder._save_results(output_file, results)
+    return len(results), finder.metrics.by_label('keyword_qualified', 'keyword')
+
+
+class MultiConfigRunner:
+    """Run several configs (e.g. product lines) off one shared fetch.
+    
+    The union of every config's subreddits and keywords is planned and
+    fetched once. Searches cover the widest ``date_range_days`` and respect
+    the smallest ``query_max_length`` and ``query_result_limit`` of all
+    configs; ``http``, ``cache``, ``requests_per_minute`` and
+    ``search_concurrency`` come from the first config only. Subreddits at a
+    config's daily reply limit are left out of that config's share. Each
+    config then gets the candidates from its own subreddits that literally
+    match its own keywords (or, from a pack of only its keywords, that
+    Reddit returned for the pack, as in a single-config run), written to a
+    candidate file, which a process pool scores with that config's weights,
+    thresholds and reply limits (the same path as ``--rerank``). Each
+    config's keyword scheduler is then charged for the live searches that
+    included its keywords and credited with its leads. API cost follows the
+    distinct queries, not the number of configs, and scoring runs on all
+    cores.
+    """
+    
+    def __init__(self, config_paths: List[str], output_dir: str = 'leads',
+                 processes: Optional[int] = None):
+        self.config_paths = config_paths
+        self.output_dir = output_dir
+        self.processes = processes or min(len(config_paths), os.cpu_count() or 1)
+        self.finders = [RedditLeadFinder(path) for path in config_paths]
+    
+    def _shard_name(self, config_path: str) -> str:
+        return os.path.splitext(os.path.basename(config_path))[0]
+    
+    def run(self) -> Dict[str, int]:
+        """Fetch once, score per config in parallel; return lead counts by config."""
+        # Only --configs needs multiprocessing; keep it out of every other command's startup
+        from concurrent.futures import ProcessPoolExecutor
+        os.makedirs(self.output_dir, exist_ok=True)
+        needs = [(finder._replyable_subreddits(finder._subreddits_to_search()), finder._search_keywords())
+                 for finder in self.finders]
+        
+        # Each subreddit needs the keywords of every config that searches it;
+        # subreddits needing the same keywords are planned together
+        needed = OrderedDict()
+        for subs, kws in needs:
+            for name in subs:
+                keywords = needed.setdefault(name, [])
+                keywords.extend(kw for kw in kws if kw not in keywords)
+        groups = OrderedDict()
+        for name, keywords in needed.items():
+            groups.setdefault(tuple(keywords), []).append(name)
+        
+        # One fetch has to serve every config: widest time window, tightest caps
+        fetcher = self.finders[0]
+        fetcher.metrics = RunMetrics()
+        date_range_days = max(finder.date_range_days for finder in self.finders)
+        max_length = min(finder.config.get('query_max_length', 512) for finder in self.finders)
+        result_limit = min(finder.config.get('query_result_limit', 100) for finder in self.finders)
+        plans = [plan for keywords, subs in groups.items()
+                 for plan in fetcher._plan_queries(subs, list(keywords), date_range_days,
+                                                   max_length, result_limit)]
+        pairs = sum(len(keywords) * len(subs) for keywords, subs in groups.items())
+        print(f"🔍 Fetching {pairs} subreddit/keyword pairs for {len(self.finders)} configs "
+              f"in {len(plans)} searches...")
+        
+        # Per config: fullname -> candidate row, in first-fetched order
+        shards = [OrderedDict() for _ in self.finders]
+        for plan, submissions in fetcher._fetch_searches(plans):
+            for (subs, kws), shard in zip(needs, shards):
+                wanted = set(kws)
+                plan_keywords = [kw for kw in plan['keywords'] if kw in wanted]
+                if not plan_keywords:
+                    continue
+                # Crediting the whole pack is only right when it is all this config's
+                own_pack = len(plan_keywords) == len(plan['keywords'])
+                for submission in submissions:
+                    display_name = submission['subreddit'].lower()
+                    if not any(name.lower() == display_name for name in subs):
+                        continue
+                    if not own_pack and not fetcher._literal_keywords(plan_keywords, submission):
+                        continue
+                    subreddit_name, found = fetcher._attribute_submission(
+                        {'subreddits': subs, 'keywords': plan_keywords}, submission)
+                    fetcher._add_candidate(shard, subreddit_name, found, submission)
+        print(f"📥 Fetched with {fetcher.stats['api_calls']} API calls")
+        
+        jobs = []
+        for config_path, shard in zip(self.config_paths, shards):
+            name = self._shard_name(config_path)
+            candidates_path = os.path.join(self.output_dir, f"{name}.candidates.jsonl")
+            fetcher._write_candidates(shard.values(), candidates_path)
+            jobs.append((config_path, candidates_path, os.path.join(self.output_dir, f"{name}.json")))
+        
+        counts = {}
+        qualified = {}
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            futures = [pool.submit(_score_shard, *job) for job in jobs]
+            for (config_path, _, output_file), future in zip(jobs, futures):
+                counts[config_path], qualified[config_path] = future.result()
+                print(f"✅ {config_path}: {counts[config_path]} leads → {output_file}")
+        
+        # Configs may share a stats file, so each records on top of the last. A
+        # keyword two configs share is charged every live search that included it
+        searches = fetcher.metrics.by_label('keyword_searches', 'keyword')
+        for config_path, finder, (subs, kws) in zip(self.config_paths, self.finders, needs):
+            scheduler = finder.keyword_scheduler
+            if not scheduler:
+                continue
+            own = {name.lower() for name in subs}
+            config_plans = [plan for plan in plans
+                            if any(name.lower() in own for name in plan['subreddits'])]
+            scheduler.load()
+            scheduler.record(config_plans, qualified[config_path], searches, keywords=kws)
+            scheduler.save()
+        return counts
+
+
 if __name__ == "__main__":
-    finder = RedditLeadFinder()
-    finder.run()
+    # --config/--output are accepted before or after the subcommand
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument('--config', default=argparse.SUPPRESS, help="Path to config.json")
+    shared.add_argument('--output', default=argparse.SUPPRESS, help="Leads file (default: leads.json)")
+    offline = argparse.ArgumentParser(add_help=False)
+    offline.add_argument('--candidates', help="Candidate file (default: rerank.candidates_path from config)")
+    
+    parser = argparse.ArgumentParser(description="Reddit Lead Finder for TradingWizard.ai")
+    parser.add_argument('--config', default='config.json', help="Path to config.json")
+    parser.add_argument('--output', help="Output file (default: leads.json, or leads.jsonl with --stream)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Run continuously, emitting leads as new posts arrive")
+    parser.add_argument('--rerank', nargs='?', const='',
+                        help="Re-rank stored candidates offline with this config's weights and thresholds")
+    parser.add_argument('--record-reply', nargs='+', metavar='URL',
+                        help="Log replies you posted to these threads so rate_limits apply to them")
+    parser.add_argument('--configs', nargs='+', metavar='CONFIG',
+                        help="Run several configs off one shared fetch, one output per config")
+    parser.add_argument('--output-dir', default='leads',
+                        help="Directory for per-config outputs with --configs (default: leads)")
+    parser.add_argument('--processes', type=int,
+                        help="Scoring processes for --configs (default: one per config, up to the CPU count)")
+    parser.add_argument('--report', help="Write a JSON run report with per-stage metrics")
+    parser.add_argument('--prometheus', help="Write run metrics in Prometheus text format")
+    parser.add_argument('--profile', nargs='?', const='profile.out',
+                        help="Profile the run with cProfile and save stats (default: profile.out)")
+    
+    # Staged runs: fetch needs the Reddit API; score, draft and rerank work
+    # from stored data without credentials
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.add_parser('fetch', parents=[shared, offline],
+                        help="Fetch search results into the candidate file without scoring")
+    commands.add_parser('score', parents=[shared, offline],
+                        help="Score stored candidates into the leads file, without reply drafts")
+    commands.add_parser('draft', parents=[shared, offline],
+                        help="Add reply drafts to leads in the leads file that lack them")
+    commands.add_parser('rerank', parents=[shared, offline],
+                        help="Score stored candidates and draft replies for the top leads")
+    args = parser.parse_args()
+    # A trailing subcommand after --configs is swallowed as a config path
+    if args.configs and (args.command or any(path in commands.choices for path in args.configs)):
+        parser.error("--configs runs the whole pipeline and can't be combined with a subcommand")
+    
+    finder = None if args.configs else RedditLeadFinder(args.config)
+    output_file = args.output or 'leads.json'
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.command == 'fetch':
+            count = finder.fetch(args.candidates)
+            print(f"📥 Fetched {count} candidates with {finder.stats['api_calls']} API calls")
+        elif args.command in ('score', 'rerank'):
+            results = finder.rerank(args.candidates, drafts=args.command == 'rerank')
+            print(f"✅ Ranked {len(results)} qualified opportunities")
+            finder._save_results(output_file, results)
+            finder.credit_fetch(args.candidates)
+        elif args.command == 'draft':
+            results = finder.draft(output_file, args.candidates)
+            print(f"✍️  Drafted replies for {finder.stats['drafts_generated']} leads")
+            finder._save_results(output_file, results)
+        elif args.configs:
+            MultiConfigRunner(args.configs, args.output_dir, args.processes).run()
+        elif args.record_reply:
+            finder.record_replies(args.record_reply, output_file)
+        elif args.stream:
+            finder.stream(args.output or 'leads.jsonl')
+        elif args.rerank is not None:
+            results = finder.rerank(args.rerank or None)
+            print(f"✅ Re-ranked to {len(results)} qualified opportunities")
+            finder._save_results(output_file, results)
+        else:
+            finder.run(output_file, args.report, args.prometheus)
+    finally:
+        if profiler:
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+            print(f"🧪 Profile saved to {args.profile}")
@@ -0,0 +1,92 @@
+"""SubmissionCache expiry and eviction, and CircuitBreaker state changes, on a fake clock."""
+
+import main
+from main import CircuitBreaker, SubmissionCache
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def payload(submission_id, score=1):
+    return {'id': submission_id, 'title': submission_id, 'score': score, 'num_comments': 0}
+
+
+def test_search_results_expire_after_ttl(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'time', clock)
+    cache = SubmissionCache(str(tmp_path / 'cache.sqlite'), search_ttl_minutes=60)
+    key = SubmissionCache.search_key(['stocks', 'options'], 'bot', 'week', 20)
+    cache.put_search(key, [payload('a'), payload('b')])
+
+    clock.now += 59 * 60
+    assert cache.get_search(key) == ['a', 'b']
+    clock.now += 2 * 60
+    assert cache.get_search(key) is None
+    assert cache.get_search(key, allow_stale=True) == ['a', 'b']
+    assert cache.get_search(SubmissionCache.search_key(['stocks'], 'bot', 'week', 20)) is None
+
+
+def test_volatile_fields_go_stale_and_refresh(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'time', clock)
+    cache = SubmissionCache(str(tmp_path / 'cache.sqlite'), volatile_ttl_minutes=15)
+    cache.put_search('k', [payload('a'), payload('b')])
+
+    clock.now += 10 * 60
+    assert cache.get_submissions(['b', 'a', 'missing']) == ([payload('b'), payload('a')], [])
+    clock.now += 6 * 60
+    assert cache.get_submissions(['a', 'b'])[1] == ['a', 'b']
+
+    cache.refresh_volatile({'a': {'score': 7, 'title': 'ignored'}})
+    payloads, stale = cache.get_submissions(['a', 'b'])
+    assert payloads == [payload('a', score=7), payload('b')]
+    assert stale == ['b']
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'time', clock)
+    cache = SubmissionCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    for name in ('first', 'second'):
+        clock.now += 1
+        cache.put_search(name, [payload(name)])
+
+    clock.now += 1
+    assert cache.get_search('first') == ['first']
+    assert cache.get_submissions(['first'])[0] == [payload('first')]
+    clock.now += 1
+    cache.put_search('third', [payload('third')])
+
+    assert cache.get_search('second') is None
+    assert cache.get_search('first') == ['first']
+    assert cache.get_search('third') == ['third']
+    assert cache.get_submissions(['first', 'second', 'third'])[0] == [payload('first'), payload('third')]
+
+
+def test_circuit_breaker_opens_probes_and_closes(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'monotonic', clock)
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+
+    breaker.record_failure('stocks')
+    assert breaker.allow('stocks')
+    breaker.record_failure('stocks')
+    assert not breaker.allow('stocks')
+    assert breaker.allow('options')
+
+    # After the reset period one probe is let through; failing it re-opens at once
+    clock.now += 10
+    assert breaker.allow('stocks')
+    breaker.record_failure('stocks')
+    assert not breaker.allow('stocks')
+
+    clock.now += 10
+    breaker.record_success('stocks')
+    assert breaker.allow('stocks')
+    breaker.record_failure('stocks')
+    assert breaker.allow('stocks')
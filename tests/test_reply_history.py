@@ -0,0 +1,63 @@
+"""ReplyHistory rules, including replies recorded by another connection."""
+
+import main
+from main import ReplyHistory
+
+DAY = 86400
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def open_history(tmp_path):
+    return ReplyHistory(str(tmp_path / 'reply_history.sqlite'), max_per_thread=1,
+                        max_per_subreddit_per_day=2, author_cooldown_hours=48)
+
+
+def test_thread_subreddit_and_author_rules(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'time', clock)
+    history = open_history(tmp_path)
+    assert history.blocked_reason('t1', 'stocks', 'alice') is None
+
+    history.record('t1', 'Stocks', 'Alice')
+    assert history.blocked_reason('t1', 'options', None) == 'reply_thread'
+    assert history.blocked_reason('t2', 'options', 'ALICE') == 'reply_author'
+    assert history.blocked_reason('t2', 'stocks', 'bob') is None
+
+    history.record('t2', 'stocks', 'bob')
+    assert history.subreddit_capped('STOCKS')
+    assert history.blocked_reason('t3', 'stocks', 'carol') == 'reply_subreddit'
+    assert history.blocked_reason('t3', 'options', 'carol') is None
+
+    # The subreddit cap is per UTC day, the author cooldown 48 hours
+    clock.now += DAY
+    assert not history.subreddit_capped('stocks')
+    assert history.blocked_reason('t3', 'stocks', 'alice') == 'reply_author'
+    clock.now += DAY
+    assert history.blocked_reason('t3', 'stocks', 'alice') is None
+    assert history.blocked_reason('t1', 'stocks', None) == 'reply_thread'
+
+
+def test_replies_from_another_connection_are_seen(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.time, 'time', FakeClock())
+    streaming = open_history(tmp_path)
+    assert streaming.blocked_reason('t1', 'stocks', 'alice') is None
+
+    # e.g. a --record-reply run while --stream keeps its history open
+    open_history(tmp_path).record('t1', 'stocks', 'alice')
+    assert streaming.blocked_reason('t1', 'options', None) == 'reply_thread'
+    assert streaming.blocked_reason('t2', 'options', 'alice') == 'reply_author'
+
+    open_history(tmp_path).record('t2', 'stocks', None)
+    assert streaming.subreddit_capped('stocks')
+
+    # Rows from both connections are indexed exactly once
+    streaming.record('t3', 'options', None)
+    assert streaming.by_thread == {'t1': 1, 't2': 1, 't3': 1}
+    assert open_history(tmp_path).by_thread == streaming.by_thread
@@ -0,0 +1,143 @@
+"""Keyword scheduling and query planning: what gets searched, and what it costs."""
+
+import json
+
+import main
+from main import KeywordScheduler, RedditLeadFinder, RunMetrics
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSubmission:
+    def __init__(self, submission_id, subreddit):
+        self.id = submission_id
+        self.title = f"post {submission_id}"
+        self.selftext = ""
+        self.score = 5
+        self.num_comments = 0
+        self.created_utc = 1_000_000.0
+        self.permalink = f"/r/{subreddit}/comments/{submission_id}/post/"
+        self.author = "someone"
+        self.subreddit = subreddit
+
+
+class FakeReddit:
+    """Answers every search with one fresh post and counts the calls."""
+
+    def __init__(self):
+        self.searches = 0
+
+    def subreddit(self, name):
+        return self
+
+    def search(self, query, time_filter=None, limit=None):
+        self.searches += 1
+        return [FakeSubmission(f"s{self.searches}", "stocks")]
+
+
+def make_finder(tmp_path, **overrides):
+    config = {
+        'allowlist_subs': ['stocks', 'options'],
+        'keywords_core': ['trading bot'],
+        'requests_per_minute': 100000,
+        'keyword_scheduler': {'enabled': False},
+        'rate_limits': {'history_path': str(tmp_path / 'reply_history.sqlite')},
+        **overrides,
+    }
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config))
+    return RedditLeadFinder(str(config_path))
+
+
+def test_select_splits_budget_between_yield_and_exploration(tmp_path):
+    scheduler = KeywordScheduler(str(tmp_path / 'stats.json'), exploration_slots=1)
+    keywords = ['a', 'b', 'c', 'd', 'e']
+
+    # No stats: every keyword ties, so keyword order decides
+    assert scheduler.select(keywords, 3) == ['a', 'b', 'c']
+    assert scheduler.select(keywords, 1) == ['a']
+
+    scheduler.stats = {
+        'a': {'api_calls': 10, 'qualified': 0, 'runs': 3, 'last_run': 200},
+        'c': {'api_calls': 1, 'qualified': 0, 'runs': 1, 'last_run': 100},
+        'd': {'api_calls': 1, 'qualified': 0, 'runs': 1, 'last_run': 50},
+        'e': {'api_calls': 1, 'qualified': 9, 'runs': 1, 'last_run': 300},
+    }
+    # Yields: e 5.0, unseen b 1.0, c and d 0.5, a 1/11. The exploration
+    # slot goes to the least recently searched of the rest: d
+    assert scheduler.select(keywords, 3) == ['e', 'b', 'd']
+
+
+def test_select_rotates_exploration_by_last_run(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, 'time', clock)
+    scheduler = KeywordScheduler(str(tmp_path / 'stats.json'), exploration_slots=1)
+    keywords = ['a', 'b', 'c', 'd']
+    scheduler.stats = {kw: {'api_calls': 1, 'qualified': 0, 'runs': 1, 'last_run': 0} for kw in keywords}
+    scheduler.stats['a']['qualified'] = 5
+
+    explored = []
+    for _ in range(3):
+        chosen = scheduler.select(keywords, 2)
+        assert chosen[0] == 'a'
+        explored.append(chosen[1])
+        clock.now += 60
+        scheduler.record([{'keywords': [kw]} for kw in chosen], {}, {kw: 1 for kw in chosen})
+    assert explored == ['b', 'c', 'd']
+
+
+def test_record_charges_each_keyword_its_share_of_the_pack(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.time, 'time', FakeClock(500.0))
+    scheduler = KeywordScheduler(str(tmp_path / 'stats.json'))
+    plans = [{'keywords': ['a', 'b']}, {'keywords': ['c']}]
+    scheduler.record(plans, {'a': 3}, {'a': 2, 'b': 2, 'c': 1})
+
+    assert scheduler.stats == {
+        'a': {'api_calls': 1.0, 'qualified': 3, 'runs': 1, 'last_run': 500.0},
+        'b': {'api_calls': 1.0, 'qualified': 0, 'runs': 1, 'last_run': 500.0},
+        'c': {'api_calls': 1.0, 'qualified': 0, 'runs': 1, 'last_run': 500.0},
+    }
+    scheduler.save()
+    assert KeywordScheduler(str(tmp_path / 'stats.json')).stats == scheduler.stats
+
+
+def test_cache_hits_are_not_charged(tmp_path):
+    finder = make_finder(tmp_path, cache={'enabled': True, 'path': str(tmp_path / 'cache.sqlite')})
+    reddit = FakeReddit()
+    finder._build_reddit = lambda: reddit
+    scheduler = KeywordScheduler(str(tmp_path / 'stats.json'))
+    plans = finder._plan_queries(['stocks', 'options'], finder.keywords[:6])
+
+    for _ in range(2):
+        finder.metrics = RunMetrics()
+        list(finder._fetch_searches(plans))
+        scheduler.record(plans, {}, finder.metrics.by_label('keyword_searches', 'keyword'))
+
+    assert reddit.searches == len(plans)
+    assert finder.metrics.totals['cache_hits'] == len(plans)
+    assert round(sum(stats['api_calls'] for stats in scheduler.stats.values()), 6) == len(plans)
+    assert all(stats['runs'] == 2 for stats in scheduler.stats.values())
+
+
+def test_plan_queries_covers_every_pair_once_within_caps(tmp_path):
+    finder = make_finder(tmp_path, query_max_length=60, query_result_limit=40)
+    subreddits = ['stocks', 'options', 'forex', 'trading', 'investing']
+    keywords = ['bot', 'trading bot', 'backtest my strategy', 'chart', 'alternative to TradingView',
+                'scanner', 'how do I analyze charts']
+    plans = finder._plan_queries(subreddits, keywords)
+
+    pairs = [(sub, kw) for plan in plans for sub in plan['subreddits'] for kw in plan['keywords']]
+    assert sorted(pairs) == sorted((sub, kw) for sub in subreddits for kw in keywords)
+    for plan in plans:
+        assert len(plan['query']) <= 60 or len(plan['keywords']) == 1
+        assert plan['limit'] == min(40, 10 * len(plan['subreddits']) * len(plan['keywords']))
+        assert plan['time_filter'] == 'week'
+
+    assert {plan['time_filter'] for plan in finder._plan_queries(subreddits, keywords, 30)} == {'month'}
+    assert finder._plan_queries([], keywords) == []
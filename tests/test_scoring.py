@@ -0,0 +1,65 @@
+"""Equivalence checks for the fast scoring paths against their simple versions."""
+
+import json
+import random
+
+from main import KeywordMatcher, RedditLeadFinder
+
+# Overlapping phrases, shared prefixes and phrases nested inside others
+PHRASES = ['a', 'ab', 'abc', 'b', 'bc', 'bca', 'ca', 'c a', 'abc ab', 'cab']
+
+
+def random_text(rng, length):
+    return ''.join(rng.choice('abc ') for _ in range(length))
+
+
+def test_find_all_matches_substring_checks():
+    rng = random.Random(0)
+    matcher = KeywordMatcher(PHRASES)
+    for _ in range(2000):
+        text = random_text(rng, rng.randint(0, 30))
+        assert matcher.find_all(text) == {p for p in PHRASES if p in text}
+
+
+def test_find_all_handles_regex_characters_and_empty_input():
+    matcher = KeywordMatcher(['c++', 'a.b', '(x)', ''])
+    assert matcher.find_all('learn c++ and a.b (x)') == {'c++', 'a.b', '(x)'}
+    assert matcher.find_all('axb') == set()
+    assert KeywordMatcher([]).find_all('anything') == set()
+
+
+def test_score_batch_matches_scalar(tmp_path):
+    # 'Trading Bot' and 'trading bot' stay separate keywords with one lowercased
+    # phrase; 'bot' and 'backtest' are nested inside longer keywords
+    config = {
+        'allowlist_subs': ['algotrading', 'smallbusiness'],
+        'keywords_core': ['trading bot', 'Trading Bot', 'backtest', 'bot', 'backtesting', 'chart'],
+        'keyword_scheduler': {'enabled': False},
+        'rate_limits': {'history_path': str(tmp_path / 'reply_history.sqlite')},
+    }
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps(config))
+    finder = RedditLeadFinder(str(config_path))
+    assert 'recommend Trading Bot' in finder.keywords
+
+    now = 1_700_000_000.0
+    rng = random.Random(1)
+    fragments = finder.keywords + [kw.upper() for kw in finder.keywords[:5]] + [
+        'AI', 'algo', 'automat', 'what', 'tool', 'should', 'use', 'the', '\n', 'cab']
+    posts = [{
+        'title': ' '.join(rng.choice(fragments) for _ in range(rng.randint(0, 3))),
+        'selftext': ' '.join(rng.choice(fragments) for _ in range(rng.randint(0, 12))),
+        'subreddit': rng.choice(['algotrading', 'smallbusiness', 'AskReddit']),
+        'created_utc': now - rng.uniform(0, 40) * 86400,
+        'score': 1,
+    } for _ in range(500)]
+
+    expected = [finder._calculate_relevance_score(p['selftext'], p['title'], p['subreddit'],
+                                                  p['created_utc'], p['score'], now=now)
+                for p in posts]
+    assert sum(1 for _, _, matched in expected if 'trading bot' in matched and 'Trading Bot' in matched) > 50
+    assert finder.score_batch(posts, now=now) == expected
+
+    threshold = sorted(score for score, _, _ in expected)[len(expected) // 2]
+    assert finder.score_batch(posts, now=now, threshold=threshold) == [
+        result if result[0] >= threshold else None for result in expected]
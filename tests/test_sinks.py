@@ -0,0 +1,27 @@
+"""TopNSink must rank exactly like sorting, deduplicating and slicing the full list."""
+
+import random
+
+from main import TopNSink
+
+
+def reference_top(leads, n):
+    seen = set()
+    ranked = []
+    for lead in sorted(leads, key=lambda lead: lead['relevance_score'], reverse=True):
+        if lead['url'] not in seen:
+            seen.add(lead['url'])
+            ranked.append(lead)
+    return ranked[:n]
+
+
+def test_top_n_matches_sort_dedupe_slice():
+    rng = random.Random(0)
+    for _ in range(500):
+        n = rng.randint(1, 8)
+        leads = [{'url': f"u{rng.randint(0, 15)}", 'relevance_score': rng.randint(50, 70), 'i': i}
+                 for i in range(rng.randint(0, 40))]
+        sink = TopNSink(n)
+        for lead in leads:
+            sink.write(lead)
+        assert sink.ranked() == reference_top(leads, n)